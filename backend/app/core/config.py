@@ -1,23 +1,44 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
+from functools import lru_cache
 
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 5        # Seconds to wait for a free connection
+    DB_POOLCLASS: str = "queue"     # "nullpool" for serverless deploys
+    
+    # Threads available to sync (def) route handlers
+    THREADPOOL_SIZE: int = 100
     
     # Security
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 1 week
     
+    # Environment ("development" or "production")
+    ENV: str = "development"
+    
     # API
     API_V1_STR: str = "/api/v1"
     PROJECT_NAME: str = "ClockOut API"
     
+    # Optional routers to mount, comma-separated (e.g. "events,reports")
+    FEATURES: str = ""
+    
+    @property
+    def feature_set(self) -> set:
+        return {name.strip() for name in self.FEATURES.split(",") if name.strip()}
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
 
 
-settings = Settings()
\ No newline at end of file
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Parse settings once per process, on first use"""
+    return Settings()
@@ -0,0 +1,127 @@
+"""
+Pure ASGI CORS middleware.
+
+Answers preflight requests directly and appends pre-encoded CORS headers
+to every other HTTP response, without wrapping the request/response in
+Starlette's Request objects.
+"""
+from typing import Sequence
+
+ALL_METHODS = ("DELETE", "GET", "HEAD", "OPTIONS", "PATCH", "POST", "PUT")
+
+
+class FastCORSMiddleware:
+    """Minimal CORS middleware registered via `app.add_middleware`"""
+
+    def __init__(
+        self,
+        app,
+        allow_origins: Sequence[str] = (),
+        allow_methods: Sequence[str] = ("GET",),
+        allow_headers: Sequence[str] = (),
+        allow_credentials: bool = False,
+        expose_headers: Sequence[str] = (),
+        max_age: int = 600,
+    ):
+        if "*" in allow_methods:
+            allow_methods = ALL_METHODS
+
+        self.app = app
+        self.allow_origins = frozenset(allow_origins)
+        self.allow_all_origins = "*" in self.allow_origins
+        self.allow_all_headers = "*" in allow_headers
+        self.allow_credentials = allow_credentials
+
+        # A literal "*" origin is only valid when the response doesn't vary by origin
+        self._wildcard_origin = self.allow_all_origins and not allow_credentials
+
+        # Inputs are fixed after init, so join and encode every header value once
+        self._allow_methods_str = ", ".join(allow_methods).encode("latin-1")
+        self._allow_headers_str = ", ".join(allow_headers).encode("latin-1")
+        self._expose_headers_str = ", ".join(expose_headers).encode("latin-1") if expose_headers else b""
+        self._max_age_str = str(max_age).encode("latin-1")
+
+        # Headers sent on every CORS response (origin is added per request)
+        self._simple_headers = []
+        if allow_credentials:
+            self._simple_headers.append((b"access-control-allow-credentials", b"true"))
+        if self._expose_headers_str:
+            self._simple_headers.append((b"access-control-expose-headers", self._expose_headers_str))
+        if not self._wildcard_origin:
+            self._simple_headers.append((b"vary", b"Origin"))
+
+        # Headers sent on every preflight response
+        self._preflight_headers = [
+            (b"access-control-allow-methods", self._allow_methods_str),
+            (b"access-control-max-age", self._max_age_str),
+        ]
+        if allow_credentials:
+            self._preflight_headers.append((b"access-control-allow-credentials", b"true"))
+        if allow_headers and not self.allow_all_headers:
+            self._preflight_headers.append((b"access-control-allow-headers", self._allow_headers_str))
+
+    def is_allowed_origin(self, origin: str) -> bool:
+        return self.allow_all_origins or origin in self.allow_origins
+
+    def origin_header(self, origin: bytes) -> tuple:
+        # Browsers reject "*" on credentialed requests, so echo the origin back
+        if self._wildcard_origin:
+            return (b"access-control-allow-origin", b"*")
+        return (b"access-control-allow-origin", origin)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = None
+        request_headers = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            await self.preflight_response(origin, request_headers, send)
+            return
+
+        if not self.is_allowed_origin(origin.decode("latin-1")):
+            await self.app(scope, receive, send)
+            return
+
+        cors_headers = [self.origin_header(origin), *self._simple_headers]
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + cors_headers
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    async def preflight_response(self, origin: bytes, request_headers, send):
+        """Answer a CORS preflight without calling the application"""
+        if not self.is_allowed_origin(origin.decode("latin-1")):
+            await send({
+                "type": "http.response.start",
+                "status": 400,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            await send({"type": "http.response.body", "body": b"Disallowed CORS origin"})
+            return
+
+        headers = [self.origin_header(origin), (b"vary", b"Origin"), *self._preflight_headers]
+        if self.allow_all_headers and request_headers:
+            headers.append((b"access-control-allow-headers", request_headers))
+        headers.append((b"content-length", b"2"))
+        headers.append((b"content-type", b"text/plain; charset=utf-8"))
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"OK"})
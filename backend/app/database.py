@@ -1,40 +1,106 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text, event, Column, DateTime
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from app.core.config import settings
-
-# Configure engine with proper SSL and connection pool settings
-engine = create_engine(
-    settings.DATABASE_URL,
-    # Connection pool settings
-    pool_pre_ping=True,  # Test connections before using them
-    pool_recycle=3600,   # Recycle connections after 1 hour
-    pool_size=5,         # Connection pool size
-    max_overflow=10,     # Max connections beyond pool_size
+from sqlalchemy.orm import sessionmaker, Session, with_loader_criteria
+from sqlalchemy.pool import NullPool
+from functools import lru_cache
+from app.core.config import get_settings
+
+Base = declarative_base()
+
+
+class SoftDeleteMixin:
+    """
+    Soft-deletable model: rows with deleted_at set are left out of every ORM
+    SELECT automatically. Pass execution_options(include_deleted=True) to
+    see them.
+    """
+    deleted_at = Column(DateTime(timezone=True))
+
+
+@event.listens_for(Session, "do_orm_execute")
+def hide_soft_deleted(execute_state):
+    """Add `deleted_at IS NULL` for soft-deletable models to ORM SELECTs"""
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                SoftDeleteMixin,
+                lambda cls: cls.deleted_at.is_(None),
+                include_aliases=True
+            )
+        )
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Create the engine once per process, on first use"""
+    settings = get_settings()
+    
     # Timeout settings
-    connect_args={
+    connect_args = {
         "connect_timeout": 10,
         "keepalives": 1,
         "keepalives_idle": 30,
         "keepalives_interval": 10,
         "keepalives_count": 5,
     }
-)
+    
+    # psycopg2 executemany: multi-row VALUES for INSERT, execute_batch for UPDATE/DELETE
+    batch_options = {
+        "executemany_mode": "values_plus_batch",
+        "insertmanyvalues_page_size": 1000,
+        "executemany_batch_page_size": 500,
+    }
+    
+    # Serverless: don't keep connections across freezes
+    if settings.DB_POOLCLASS.lower() == "nullpool":
+        return create_engine(
+            settings.DATABASE_URL,
+            poolclass=NullPool,
+            connect_args=connect_args,
+            **batch_options
+        )
+    
+    # Configure engine with proper SSL and connection pool settings
+    return create_engine(
+        settings.DATABASE_URL,
+        # Connection pool settings
+        pool_pre_ping=True,                        # Test connections before using them
+        pool_recycle=3600,                         # Recycle connections after 1 hour
+        pool_size=settings.DB_POOL_SIZE,           # Connection pool size
+        max_overflow=settings.DB_MAX_OVERFLOW,     # Max connections beyond pool_size
+        pool_timeout=settings.DB_POOL_TIMEOUT,     # Fail fast when the pool is exhausted
+        pool_use_lifo=True,                        # Reuse the most recently returned connection
+        connect_args=connect_args,
+        **batch_options
+    )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+@lru_cache(maxsize=1)
+def get_sessionmaker():
+    """Session factory bound to the shared engine"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 
 def get_db():
     """Dependency for getting database session"""
-    db = SessionLocal()
+    db = get_sessionmaker()()
     try:
         yield db
     finally:
         db.close()
 
 
+def check_db_connection():
+    """Run a trivial query to confirm the database is reachable"""
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT 1"))
+
+
 def init_db():
     """Initialize database - create all tables"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=get_engine())
\ No newline at end of file
@@ -1,27 +1,90 @@
 from fastapi import FastAPI, Request
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
+import anyio
+import asyncio
+import importlib
+import logging
 
-# Import all route modules
-from app.routes import auth
-from app.routes import organizations
-from app.routes import sites
-from app.routes import workers
-from app.routes import users
-
-# NEW: Import worker feature routes
-from app.routes import worker_auth
-from app.routes import tasks
-from app.routes import attendance
-from app.routes import issues
+# Import middleware
+from app.core.cors import FastCORSMiddleware
 
 # Import database
-from app.database import engine, Base
+from app.database import check_db_connection, get_engine
+
+from app.core.config import get_settings
+
+logger = logging.getLogger("clockout")
 
-# Create database tables on startup (if they don't exist)
-# Note: We're using Alembic migrations now, so this is mainly for development
-# Base.metadata.create_all(bind=engine)
+
+# ==========================================
+# ROUTES
+# ==========================================
+# (module in app.routes, prefix, tags) - imported lazily in lifespan so the
+# models/schemas behind each router aren't loaded until the server starts
+ROUTES = [
+    # Core authentication routes (admin/manager)
+    ("auth", "/api/v1", ["Authentication"]),
+    # Organization management
+    ("organizations", "/api/v1", ["Organizations"]),
+    # Sites management (farm locations)
+    ("sites", "/api/v1", ["Sites"]),
+    # Workers management (HR records)
+    ("workers", "/api/v1", ["Workers"]),
+    # Users management (admin/manager accounts)
+    ("users", "/api/v1", ["Users"]),
+    # Worker authentication (login with employee_id)
+    ("worker_auth", "/api/v1", ["Worker Auth"]),
+    # Task management (for both managers and workers)
+    ("tasks", "/api/v1", ["Tasks"]),
+    # Auto-attendance with GPS geofencing
+    ("attendance", "/api/v1", ["Attendance"]),
+    # Issue reporting (pests, equipment, etc.)
+    ("issues", "/api/v1", ["Issues"]),
+]
+
+# Routers only mounted when named in settings.FEATURES
+OPTIONAL_ROUTES = [
+    # Raw clock events and offline bulk sync
+    ("events", "/api/v1/events", ["Events"]),
+    # NFC checkpoints
+    ("checkpoints", "/api/v1/checkpoints", ["Checkpoints"]),
+    # Audit log viewer
+    ("audit", "/api/v1/audit", ["Audit"]),
+    # Worker/site activity timelines
+    ("timeline", "/api/v1/timeline", ["Timeline"]),
+    # Attendance reports and CSV export
+    ("reports", "/api/v1/reports", ["Reports"]),
+    # Worker performance and bulk operations
+    ("worker_analytics", "/api/v1/workers", ["Worker Analytics"]),
+]
+
+
+def include_routes(app: FastAPI):
+    """Import each enabled route module and register its router"""
+    features = get_settings().feature_set
+    # Optional routers go first: their prefixes are specific, while core
+    # routers own catch-alls like /api/v1/{org_id} and /workers/{worker_id}
+    # that would otherwise swallow /api/v1/audit/stats or /workers/search.
+    # Keep optional prefixes distinct from real core paths for the same reason.
+    enabled = [route for route in OPTIONAL_ROUTES if route[0] in features] + ROUTES
+    for name, prefix, tags in enabled:
+        module = importlib.import_module(f"app.routes.{name}")
+        app.include_router(module.router, prefix=prefix, tags=tags)
+
+
+async def wait_for_database(app: FastAPI):
+    """Mark the app ready once the database answers (runs off the startup path)"""
+    while True:
+        try:
+            await run_in_threadpool(check_db_connection)
+            break
+        except Exception as e:
+            print(f"⚠️ Database not ready: {str(e)}")
+            await asyncio.sleep(2)
+    app.state.db_ready = True
+    print("📊 Database connected")
 
 
 @asynccontextmanager
@@ -31,21 +94,33 @@ async def lifespan(app: FastAPI):
     """
     # Startup
     print("🚀 ClockOut API Starting...")
-    print("📊 Database connected")
+    # Sync handlers run in anyio's threadpool (default 40 threads)
+    anyio.to_thread.current_default_thread_limiter().total_tokens = get_settings().THREADPOOL_SIZE
+    include_routes(app)
     print("✅ All routes loaded")
+    # Connect in the background so the server binds and answers health checks immediately
+    app.state.db_ready = False
+    db_task = asyncio.create_task(wait_for_database(app))
     yield
     # Shutdown
+    db_task.cancel()
     print("👋 ClockOut API Shutting down...")
 
 
+# OpenAPI schema and docs are only served outside production; the schema
+# is built on first request, so this mainly trims the public surface
+IS_PRODUCTION = get_settings().ENV == "production"
+
 # Initialize FastAPI app
 app = FastAPI(
     title="ClockOut API",
     description="GPS-verified farm attendance tracking system for Nigerian agriculture",
     version="2.0.0",
     lifespan=lifespan,
-    docs_url="/docs",
-    redoc_url="/redoc"
+    default_response_class=ORJSONResponse,  # orjson serializes datetimes natively and much faster than json
+    openapi_url=None if IS_PRODUCTION else "/openapi.json",
+    docs_url=None if IS_PRODUCTION else "/docs",
+    redoc_url=None if IS_PRODUCTION else "/redoc"
 )
 
 
@@ -54,7 +129,7 @@ app = FastAPI(
 # ==========================================
 # Allow requests from your Android app and frontend
 app.add_middleware(
-    CORSMiddleware,
+    FastCORSMiddleware,
     allow_origins=[
         "http://localhost:3000",  # React frontend
         "http://localhost:8081",  # React Native/Expo
@@ -63,6 +138,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],  # Allow all headers
+    expose_headers=["X-Next-Cursor"],  # Keyset paging cursor (event and issue lists)
 )
 
 
@@ -78,7 +154,7 @@ async def root():
         "message": "ClockOut API is running",
         "version": "2.0.0",
         "status": "healthy",
-        "docs": "/docs"
+        "docs": app.docs_url
     }
 
 
@@ -86,83 +162,54 @@ async def root():
 async def health_check():
     """
     Health check endpoint for monitoring.
+    
+    `db_pool` is the connection pool's status line (checked in/out,
+    overflow) once the database is up.
     """
     return {
         "status": "healthy",
-        "version": "2.0.0"
+        "version": "2.0.0",
+        "db_pool": get_engine().pool.status() if getattr(app.state, "db_ready", False) else None
     }
 
 
-# ==========================================
-# REGISTER ALL ROUTES
-# ==========================================
-
-# Core authentication routes (admin/manager)
-app.include_router(
-    auth.router,
-    prefix="/api/v1",
-    tags=["Authentication"]
-)
-
-# Organization management
-app.include_router(
-    organizations.router,
-    prefix="/api/v1",
-    tags=["Organizations"]
-)
-
-# Sites management (farm locations)
-app.include_router(
-    sites.router,
-    prefix="/api/v1",
-    tags=["Sites"]
-)
-
-# Workers management (HR records)
-app.include_router(
-    workers.router,
-    prefix="/api/v1",
-    tags=["Workers"]
-)
-
-# Users management (admin/manager accounts)
-app.include_router(
-    users.router,
-    prefix="/api/v1",
-    tags=["Users"]
-)
+@app.get("/health/live", tags=["Health"])
+async def liveness_check():
+    """
+    Liveness probe - always 200 while the process is serving.
+    """
+    return {"status": "alive"}
 
-# ==========================================
-# NEW: WORKER FEATURE ROUTES
-# ==========================================
 
-# Worker authentication (login with employee_id)
-app.include_router(
-    worker_auth.router,
-    prefix="/api/v1",
-    tags=["Worker Auth"]
-)
-
-# Task management (for both managers and workers)
-app.include_router(
-    tasks.router,
-    prefix="/api/v1",
-    tags=["Tasks"]
-)
+@app.get("/health/ready", tags=["Health"])
+async def readiness_check():
+    """
+    Readiness probe - 503 until the database connection is confirmed.
+    """
+    if not getattr(app.state, "db_ready", False):
+        return ORJSONResponse(status_code=503, content={"status": "starting"})
+    return {"status": "ready"}
 
-# Auto-attendance with GPS geofencing
-app.include_router(
-    attendance.router,
-    prefix="/api/v1",
-    tags=["Attendance"]
-)
 
-# Issue reporting (pests, equipment, etc.)
-app.include_router(
-    issues.router,
-    prefix="/api/v1",
-    tags=["Issues"]
-)
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """
+    Connection pool counters for monitoring.
+    
+    Under NullPool (DB_POOLCLASS=nullpool, e.g. behind PgBouncer) there is
+    no pool to report and `db_pool` is null.
+    """
+    pool = get_engine().pool
+    if not hasattr(pool, "checkedout"):
+        return {"db_pool": None}
+    return {
+        "db_pool": {
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        }
+    }
 
 
 # ==========================================
@@ -173,13 +220,10 @@ async def global_exception_handler(request: Request, exc: Exception):
     """
     Catch all unhandled exceptions and return a proper JSON response.
     """
-    import traceback
-    
-    # Log the full error (in production, use proper logging)
-    print("❌ Unhandled Exception:")
-    print(traceback.format_exc())
+    # Log the full error with the traceback from the active exception
+    logger.exception("❌ Unhandled Exception: %s %s", request.method, request.url.path)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": "Internal server error",
@@ -219,13 +263,20 @@ async def startup_event():
 # MAIN ENTRY POINT
 # ==========================================
 if __name__ == "__main__":
+    import os
     import uvicorn
     
-    # Run the server
+    # Auto-reload only in development; it spawns a file-watching supervisor
+    is_dev = get_settings().ENV == "development"
+    
+    # Run the server (loop/http "auto" pick uvloop and httptools when installed)
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True,  # Auto-reload on code changes (development only)
+        port=int(os.environ.get("PORT", 8000)),
+        reload=is_dev,
+        workers=1 if is_dev else int(os.environ.get("WEB_CONCURRENCY", 1)),
+        loop="auto",
+        http="auto",
         log_level="info"
-    )
\ No newline at end of file
+    )
@@ -0,0 +1,32 @@
+from sqlalchemy import Table, Column, Integer, Date, Numeric, MetaData, DDL, event
+from app.database import Base
+
+# Materialized view of hours worked per worker per day, used by the
+# weekly/monthly summaries instead of re-aggregating raw shifts.
+# Days are UTC dates, matching day_range/utc_today in the attendance routes.
+# Kept out of Base.metadata so create_all doesn't create it as a table.
+view_metadata = MetaData()
+
+attendance_daily_summary = Table(
+    "attendance_daily_summary",
+    view_metadata,
+    Column("worker_id", Integer, primary_key=True),
+    Column("day", Date, primary_key=True),
+    Column("hours", Numeric(7, 2)),
+)
+
+# The unique index is required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE_ATTENDANCE_DAILY_SUMMARY = [
+    DDL(
+        "CREATE MATERIALIZED VIEW IF NOT EXISTS attendance_daily_summary AS "
+        "SELECT worker_id, (clock_in_time AT TIME ZONE 'UTC')::date AS day, SUM(total_hours) AS hours "
+        "FROM auto_attendance GROUP BY 1, 2"
+    ),
+    DDL(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_attendance_daily_summary "
+        "ON attendance_daily_summary (worker_id, day)"
+    ),
+]
+
+for statement in CREATE_ATTENDANCE_DAILY_SUMMARY:
+    event.listen(Base.metadata, "after_create", statement)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -9,9 +9,22 @@ class AuditLog(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # Null for system actions
+    organization_id = Column(Integer, ForeignKey("organizations.id"), nullable=True)  # Copied from the user at write time
     action = Column(String(50), nullable=False, index=True)  # login, create, update, delete, etc.
     entity_type = Column(String(50), nullable=False, index=True)  # worker, site, user, etc.
     entity_id = Column(Integer, nullable=True)  # ID of affected entity
     details = Column(JSON, nullable=True)  # Additional context
     ip_address = Column(String(45), nullable=True)  # IPv4 or IPv6
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
\ No newline at end of file
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    __table_args__ = (
+        # Newest first, with id as the tiebreaker for cursor pagination
+        Index('ix_audit_logs_created_id', created_at.desc(), id.desc()),
+        # Rows arrive in created_at order, so a tiny BRIN index covers wide date ranges (stats)
+        Index('ix_audit_logs_created_brin', 'created_at', postgresql_using='brin'),
+        # Filtered listings, newest first
+        Index('ix_audit_logs_org_created', 'organization_id', created_at.desc()),
+        Index('ix_audit_logs_user_created', 'user_id', created_at.desc()),
+        Index('ix_audit_logs_action_created', 'action', created_at.desc()),
+        Index('ix_audit_logs_entity_created', 'entity_type', created_at.desc()),
+    )
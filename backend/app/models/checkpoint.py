@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, Numeric, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.sql import func
-from app.database import Base
+from sqlalchemy.orm import relationship
+from app.database import Base, SoftDeleteMixin
 
 
-class Checkpoint(Base):
+class Checkpoint(SoftDeleteMixin, Base):
     """NFC checkpoint locations for future Stage 6"""
     __tablename__ = "checkpoints"
     
@@ -13,7 +14,7 @@ class Checkpoint(Base):
     description = Column(String)
     checkpoint_type = Column(String(20))  # entry, exit, task, patrol
     
-    nfc_tag_id = Column(String(100), unique=True, index=True)
+    nfc_tag_id = Column(String(100))  # unique among live checkpoints (ix_cp_nfc_live)
     qr_code = Column(String(100))  # Added QR code support
     
     # GPS coordinates (renamed for API consistency)
@@ -23,8 +24,18 @@ class Checkpoint(Base):
     is_active = Column(Boolean, default=True)
     created_by = Column(Integer, ForeignKey("users.id"))
     
-    # Soft delete support
-    deleted_at = Column(DateTime(timezone=True))
+    # Soft delete support: deleted_at comes from SoftDeleteMixin, which
+    # hides deleted checkpoints from ORM queries
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Never lazy-loaded; use joinedload(Checkpoint.site) when the name is needed
+    site = relationship("Site", lazy="raise_on_sql")
+    
+    __table_args__ = (
+        # NFC tag lookup / duplicate check; a soft-deleted checkpoint frees its tag
+        Index('ix_cp_nfc_live', 'nfc_tag_id', unique=True, postgresql_where=text('deleted_at IS NULL')),
+        # Checkpoint listings per site, optionally filtered by is_active
+        Index('ix_cp_site_active_live', 'site_id', 'is_active', postgresql_where=text('deleted_at IS NULL')),
+    )
@@ -0,0 +1,77 @@
+from datetime import timedelta
+from sqlalchemy import Table, Column, Integer, String, DDL, event
+from app.database import Base
+from app.models.attendance_summary import view_metadata
+from app.utils.matviews import schedule_refresh
+
+# Materialized views behind the issue and organization usage dashboards,
+# so a page view reads a few pre-aggregated rows instead of re-counting.
+# Like attendance_daily_summary they live in view_metadata, not Base.metadata.
+
+# Issue counts per organization by (status, severity, type)
+org_issue_counts = Table(
+    "mv_org_issue_counts",
+    view_metadata,
+    Column("organization_id", Integer, primary_key=True),
+    Column("status", String(20), primary_key=True),
+    Column("severity", String(20), primary_key=True),
+    Column("issue_type", String(50), primary_key=True),
+    Column("count", Integer),
+)
+
+# Current usage per organization, compared against plan limits
+org_usage_stats = Table(
+    "mv_org_usage_stats",
+    view_metadata,
+    Column("organization_id", Integer, primary_key=True),
+    Column("current_sites", Integer),
+    Column("current_workers", Integer),
+    Column("current_managers", Integer),
+)
+
+# The unique indexes are required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE_DASHBOARD_STATS = [
+    DDL(
+        "CREATE MATERIALIZED VIEW IF NOT EXISTS mv_org_issue_counts AS "
+        "SELECT organization_id, status, severity, issue_type, COUNT(*)::int AS count "
+        "FROM issue_reports GROUP BY 1, 2, 3, 4"
+    ),
+    DDL(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_org_issue_counts "
+        "ON mv_org_issue_counts (organization_id, status, severity, issue_type)"
+    ),
+    DDL(
+        "CREATE MATERIALIZED VIEW IF NOT EXISTS mv_org_usage_stats AS "
+        "SELECT o.id AS organization_id, "
+        "(SELECT COUNT(*) FROM sites s "
+        " WHERE s.organization_id = o.id AND s.deleted_at IS NULL)::int AS current_sites, "
+        "(SELECT COUNT(*) FROM workers w "
+        " WHERE w.organization_id = o.id AND w.deleted_at IS NULL AND w.is_active)::int AS current_workers, "
+        "(SELECT COUNT(*) FROM users u "
+        " WHERE u.organization_id = o.id AND u.is_active "
+        " AND (u.user_mode = 'manager' OR u.role = 'manager'))::int AS current_managers "
+        "FROM organizations o"
+    ),
+    DDL(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_org_usage_stats "
+        "ON mv_org_usage_stats (organization_id)"
+    ),
+]
+
+for statement in CREATE_DASHBOARD_STATS:
+    event.listen(Base.metadata, "after_create", statement)
+
+
+# Views are refreshed after writes that change them, at most this often
+# per process; a write inside the window gets a trailing refresh
+STATS_REFRESH_INTERVAL = timedelta(seconds=60)
+
+
+def refresh_org_issue_counts():
+    """Queue a refresh of mv_org_issue_counts (call after issue writes)"""
+    schedule_refresh("mv_org_issue_counts", STATS_REFRESH_INTERVAL)
+
+
+def refresh_org_usage_stats():
+    """Queue a refresh of mv_org_usage_stats (call after site/worker/user writes)"""
+    schedule_refresh("mv_org_usage_stats", STATS_REFRESH_INTERVAL)
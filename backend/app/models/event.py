@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -51,12 +51,17 @@ class ClockEvent(Base):
     synced_at = Column(DateTime(timezone=True), server_default=func.now())
     source = Column(String, default="GPS")
     
-    worker = relationship("Worker", back_populates="clock_events")
-    site = relationship("Site", back_populates="clock_events")
-    device = relationship("Device", back_populates="clock_events")
+    # Loading these per row would be an N+1; use selectinload() on the query
+    worker = relationship("Worker", back_populates="clock_events", lazy="raise_on_sql")
+    site = relationship("Site", back_populates="clock_events", lazy="raise_on_sql")
+    device = relationship("Device", back_populates="clock_events", lazy="raise_on_sql")
     
     __table_args__ = (
         Index('idx_site_timestamp', 'site_id', 'event_timestamp'),
         Index('idx_worker_timestamp', 'worker_id', 'event_timestamp'),
+        Index('idx_worker_site_timestamp', 'worker_id', 'site_id', 'event_timestamp', unique=True),
         Index('idx_event_timestamp', 'event_timestamp'),
+        # Checkpoint scan counts / last use (only NFC events carry a checkpoint)
+        Index('ix_clock_events_checkpoint_ts', 'checkpoint_id', event_timestamp.desc(),
+              postgresql_where=text('checkpoint_id IS NOT NULL')),
     )
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Time, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Time, ForeignKey, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -35,4 +35,9 @@ class Site(Base):
     # Relationships
     organization = relationship("Organization", back_populates="sites")
     workers = relationship("Worker", back_populates="site")
-    clock_events = relationship("ClockEvent", back_populates="site")
\ No newline at end of file
+    clock_events = relationship("ClockEvent", back_populates="site")
+    
+    __table_args__ = (
+        # Active sites of an organization (listings, access checks, org site ids)
+        Index('ix_sites_org_live', 'organization_id', postgresql_where=text('deleted_at IS NULL')),
+    )
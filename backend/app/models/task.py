@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Date, Time, Numeric, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, Date, Time, Numeric, ForeignKey, JSON, Index, text, DDL, event, Computed
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -89,6 +89,15 @@ class IssueReport(Base):
     # Metadata
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    # Names for responses; list queries load these with joinedload()
+    reporter = relationship("Worker")
+    site = relationship("Site")
+    
+    __table_args__ = (
+        # Manager issue list: organization filter, open issues first, newest first
+        Index('ix_issue_reports_org_status_created', 'organization_id', 'status', created_at.desc(), id.desc()),
+    )
 
 
 class AutoAttendance(Base):
@@ -115,14 +124,55 @@ class AutoAttendance(Base):
     clock_out_accuracy_m = Column(Numeric(10, 2))
     auto_clocked_out = Column(Boolean, default=True)
     
-    # Calculated fields
-    total_hours = Column(Numeric(5, 2))
+    # Calculated fields (total_hours is maintained by Postgres)
+    total_hours = Column(Numeric(5, 2), Computed(
+        "ROUND((EXTRACT(EPOCH FROM (clock_out_time - clock_in_time)) / 3600.0)::numeric, 2)",
+        persisted=True
+    ))
     is_valid = Column(Boolean, default=True)
     
+    # Denormalized display names (kept in sync by triggers on workers/sites)
+    worker_name = Column(String)
+    site_name = Column(String)
+    
     # Metadata
     device_id = Column(String(255))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    worker = relationship("Worker")
+    site = relationship("Site")
+    
+    # Fetch server defaults (created_at) in the INSERT's RETURNING clause
+    __mapper_args__ = {"eager_defaults": True}
+    
+    __table_args__ = (
+        # Per-worker history, newest first
+        Index('ix_auto_att_worker_time', 'worker_id', clock_in_time.desc()),
+        # Open shift lookup on every clock-in/clock-out
+        Index('ix_auto_att_open', 'worker_id', 'clock_in_time', postgresql_where=text('clock_out_time IS NULL')),
+    )
+
+
+# Propagate worker/site renames into auto_attendance display names
+for _source, _column in (("workers", "worker"), ("sites", "site")):
+    for _statement in (
+        f"""
+        CREATE OR REPLACE FUNCTION sync_attendance_{_column}_name() RETURNS trigger AS $$
+        BEGIN
+            UPDATE auto_attendance SET {_column}_name = NEW.name WHERE {_column}_id = NEW.id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f"""
+        CREATE TRIGGER trg_{_source}_attendance_name
+        AFTER UPDATE OF name ON {_source}
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION sync_attendance_{_column}_name()
+        """,
+    ):
+        event.listen(AutoAttendance.__table__, "after_create", DDL(_statement))
 
 
 class Notification(Base):
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Numeric, Index
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, deferred
 from app.database import Base
 
 
@@ -8,7 +8,7 @@ class Organization(Base):
     __tablename__ = "organizations"
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, nullable=False)
+    name = Column(String, nullable=False, unique=True)
     
     # ✅ STAGE 1: Owner information
     owner_name = Column(String(200))
@@ -32,18 +32,18 @@ class Organization(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relationships
-    sites = relationship("Site", back_populates="organization")
-    users = relationship("User", back_populates="organization")
-    workers = relationship("Worker", back_populates="organization")
+    # Relationships (never lazy-loaded; opt in with selectinload() to avoid N+1)
+    sites = relationship("Site", back_populates="organization", lazy="raise_on_sql")
+    users = relationship("User", back_populates="organization", lazy="raise_on_sql")
+    workers = relationship("Worker", back_populates="organization", lazy="raise_on_sql")
 
 
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
-    email = Column(String, unique=True, index=True, nullable=False)
-    hashed_password = Column(String, nullable=False)
+    email = Column(String, nullable=False)  # Unique case-insensitively (see __table_args__)
+    hashed_password = deferred(Column(String, nullable=False))  # Only loaded by login (undefer)
     full_name = Column(String)
     role = Column(String, nullable=False)  # admin, manager (legacy)
     user_mode = Column(String, default="manager")  # manager, admin
@@ -66,4 +66,11 @@ class User(Base):
     
     # Relationships
     organization = relationship("Organization", back_populates="users")
-    role_ref = relationship("Role", back_populates="users")  # ← THIS IS THE FIX!
\ No newline at end of file
+    role_ref = relationship("Role", back_populates="users")  # ← THIS IS THE FIX!
+    # Manager site assignments (read-only; user_sites is written with raw SQL)
+    assigned_sites = relationship("Site", secondary="user_sites", viewonly=True, lazy="raise_on_sql")
+    
+    __table_args__ = (
+        # Look users up with func.lower(User.email) == email.lower()
+        Index('uq_users_email_lower', func.lower(email), unique=True),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Numeric
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Date, Numeric, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.database import Base
@@ -42,14 +42,19 @@ class Worker(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relationships
-    organization = relationship("Organization", back_populates="workers")
-    site = relationship("Site", back_populates="workers")
-    clock_events = relationship("ClockEvent", back_populates="worker")
+    # Relationships (never lazy-loaded; opt in with selectinload() to avoid N+1)
+    organization = relationship("Organization", back_populates="workers", lazy="raise_on_sql")
+    site = relationship("Site", back_populates="workers", lazy="raise_on_sql")
+    clock_events = relationship("ClockEvent", back_populates="worker", lazy="raise_on_sql")
     
     # 🆕 NEW: Relationship to user account
     user = relationship("User", foreign_keys=[user_id])
     
+    __table_args__ = (
+        # Active workers of an organization (listings, bulk sync validation)
+        Index('ix_workers_org_live', 'organization_id', postgresql_where=text('deleted_at IS NULL')),
+    )
+    
     # 🆕 NEW: Relationships to new tables
     # tasks = relationship("Task", back_populates="worker")
     # attendance_records = relationship("AutoAttendance", back_populates="worker")
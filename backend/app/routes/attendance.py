@@ -1,12 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, or_, select, union_all
 from typing import List
-from datetime import datetime, date, timedelta
-from decimal import Decimal
-import math
+from datetime import datetime, date, time, timedelta, timezone
 from app.database import get_db
 from app.models.task import AutoAttendance
+from app.models.attendance_summary import attendance_daily_summary
 from app.models.worker import Worker
 from app.models.site import Site
 from app.schemas.task import (
@@ -14,27 +13,29 @@ from app.schemas.task import (
     AttendanceResponse, AttendanceSummaryResponse
 )
 from app.routes.worker_auth import get_current_worker
+from app.utils.geo import calculate_distance, inside_geofence
+from app.utils.cache import attendance_summary_cache, invalidate_attendance_summaries
+from app.utils.matviews import refresh_materialized_view
 
 router = APIRouter(prefix="/attendance", tags=["Attendance"])
 
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+def utc_today() -> date:
     """
-    Calculate distance between two GPS coordinates using Haversine formula.
-    Returns distance in meters.
+    Today's date in UTC: the day boundary used by day_range, the daily
+    summary view and the summary cache keys
     """
-    R = 6371000  # Earth's radius in meters
-    
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    delta_lat = math.radians(lat2 - lat1)
-    delta_lon = math.radians(lon2 - lon1)
-    
-    a = math.sin(delta_lat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(delta_lon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    
-    distance = R * c
-    return distance
+    return datetime.now(timezone.utc).date()
+
+
+def day_range(start_day: date, end_day: date) -> tuple[datetime, datetime]:
+    """
+    UTC bounds [start, end) covering start_day..end_day inclusive.
+    Comparing the raw timestamp column against these keeps it indexable.
+    """
+    start = datetime.combine(start_day, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(end_day, time.min, tzinfo=timezone.utc) + timedelta(days=1)
+    return start, end
 
 
 @router.post("/clock-in", response_model=AttendanceResponse)
@@ -47,70 +48,13 @@ async def clock_in(
     Clock in worker - validates GPS location against site geofence.
     Can be auto (geofence triggered) or manual.
     """
-    # Check if already clocked in today
-    existing_attendance = db.query(AutoAttendance).filter(
-        AutoAttendance.worker_id == current_worker.id,
-        func.date(AutoAttendance.clock_in_time) == date.today(),
-        AutoAttendance.clock_out_time == None
-    ).first()
-    
-    if existing_attendance:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already clocked in. Clock out first."
-        )
-    
-    # Get site details
-    site = db.query(Site).filter(Site.id == clock_in_data.site_id).first()
-    
-    if not site:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Site not found"
-        )
-    
-    # Validate GPS location is within geofence
-    distance = calculate_distance(
-        float(clock_in_data.gps_lat),
-        float(clock_in_data.gps_lon),
-        float(site.gps_lat),
-        float(site.gps_lon)
-    )
-    
-    is_valid = distance <= float(site.radius_m)
-    
-    if not is_valid and clock_in_data.auto:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Location outside geofence. Distance: {int(distance)}m, Required: {site.radius_m}m"
-        )
-    
-    # Create attendance record
-    attendance = AutoAttendance(
-        worker_id=current_worker.id,
-        site_id=clock_in_data.site_id,
-        organization_id=current_worker.organization_id,
-        clock_in_time=datetime.utcnow(),
-        clock_in_gps_lat=clock_in_data.gps_lat,
-        clock_in_gps_lon=clock_in_data.gps_lon,
-        clock_in_accuracy_m=clock_in_data.accuracy_m,
-        auto_clocked_in=clock_in_data.auto,
-        device_id=clock_in_data.device_id,
-        is_valid=is_valid
-    )
-    
-    db.add(attendance)
-    db.commit()
-    db.refresh(attendance)
-    
-    # TODO: Send notification to worker
-    
-    return enrich_attendance_response(attendance, db)
+    return perform_clock_in(db, current_worker, clock_in_data, clock_in_data.auto)
 
 
 @router.post("/clock-out", response_model=AttendanceResponse)
 async def clock_out(
     clock_out_data: AttendanceClockOutRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_worker: Worker = Depends(get_current_worker)
 ):
@@ -118,56 +62,12 @@ async def clock_out(
     Clock out worker - validates GPS and calculates total hours.
     Can be auto (geofence triggered) or manual.
     """
-    # Find today's open attendance record
-    attendance = db.query(AutoAttendance).filter(
-        AutoAttendance.worker_id == current_worker.id,
-        func.date(AutoAttendance.clock_in_time) == date.today(),
-        AutoAttendance.clock_out_time == None
-    ).first()
-    
-    if not attendance:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="No active clock-in found. Clock in first."
-        )
-    
-    # Get site details for geofence validation
-    site = db.query(Site).filter(Site.id == attendance.site_id).first()
-    
-    # Validate GPS (for auto clock-out)
-    if clock_out_data.auto and site:
-        distance = calculate_distance(
-            float(clock_out_data.gps_lat),
-            float(clock_out_data.gps_lon),
-            float(site.gps_lat),
-            float(site.gps_lon)
-        )
-        
-        # For clock-out, we're checking if they're OUTSIDE the geofence
-        # If auto is True, they should be outside
-        if distance <= float(site.radius_m):
-            # Still inside geofence, probably shouldn't auto-clock-out
-            pass  # But we'll allow it
-    
-    # Update attendance record
-    attendance.clock_out_time = datetime.utcnow()
-    attendance.clock_out_gps_lat = clock_out_data.gps_lat
-    attendance.clock_out_gps_lon = clock_out_data.gps_lon
-    attendance.clock_out_accuracy_m = clock_out_data.accuracy_m
-    attendance.auto_clocked_out = clock_out_data.auto
-    
-    # Calculate total hours
-    duration = (attendance.clock_out_time - attendance.clock_in_time).total_seconds() / 3600
-    attendance.total_hours = Decimal(str(round(duration, 2)))
+    response = perform_clock_out(db, current_worker, clock_out_data, clock_out_data.auto)
     
-    attendance.updated_at = datetime.utcnow()
+    # Fold finished shifts into the daily summary view
+    background_tasks.add_task(refresh_attendance_daily_summary)
     
-    db.commit()
-    db.refresh(attendance)
-    
-    # TODO: Send notification to worker with summary
-    
-    return enrich_attendance_response(attendance, db)
+    return response
 
 
 @router.get("/my/today", response_model=AttendanceResponse)
@@ -178,9 +78,12 @@ async def get_today_attendance(
     """
     Get today's attendance record for current worker.
     """
+    today = utc_today()
+    today_start, tomorrow_start = day_range(today, today)
     attendance = db.query(AutoAttendance).filter(
         AutoAttendance.worker_id == current_worker.id,
-        func.date(AutoAttendance.clock_in_time) == date.today()
+        AutoAttendance.clock_in_time >= today_start,
+        AutoAttendance.clock_in_time < tomorrow_start
     ).first()
     
     if not attendance:
@@ -189,7 +92,7 @@ async def get_today_attendance(
             detail="No attendance record for today"
         )
     
-    return enrich_attendance_response(attendance, db)
+    return AttendanceResponse.model_validate(attendance)
 
 
 @router.get("/my/history", response_model=List[AttendanceResponse])
@@ -209,17 +112,17 @@ async def get_attendance_history(
     
     # Apply date filters
     if start_date:
-        query = query.filter(func.date(AutoAttendance.clock_in_time) >= start_date)
+        query = query.filter(AutoAttendance.clock_in_time >= day_range(start_date, start_date)[0])
     
     if end_date:
-        query = query.filter(func.date(AutoAttendance.clock_in_time) <= end_date)
+        query = query.filter(AutoAttendance.clock_in_time < day_range(end_date, end_date)[1])
     
     # Order by most recent first
     query = query.order_by(AutoAttendance.clock_in_time.desc())
     
     attendance_records = query.limit(limit).all()
     
-    return [enrich_attendance_response(record, db) for record in attendance_records]
+    return [AttendanceResponse.model_validate(record) for record in attendance_records]
 
 
 @router.get("/my/summary/week", response_model=AttendanceSummaryResponse)
@@ -231,7 +134,7 @@ async def get_weekly_summary(
     Get weekly attendance summary for current worker.
     """
     # Calculate start of week (Monday)
-    today = date.today()
+    today = utc_today()
     week_start = today - timedelta(days=today.weekday())
     
     return get_attendance_summary(
@@ -252,7 +155,7 @@ async def get_monthly_summary(
     Get monthly attendance summary for current worker.
     """
     # Start of current month
-    today = date.today()
+    today = utc_today()
     month_start = today.replace(day=1)
     
     return get_attendance_summary(
@@ -273,37 +176,158 @@ async def manual_clock_in(
     """
     Manual clock-in for exceptions (GPS issues, coming on off-day, etc.)
     """
-    clock_in_data.auto = False
-    return await clock_in(clock_in_data, db, current_worker)
+    return perform_clock_in(db, current_worker, clock_in_data, is_auto=False)
 
 
 @router.post("/manual/clock-out", response_model=AttendanceResponse)
 async def manual_clock_out(
     clock_out_data: AttendanceClockOutRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     current_worker: Worker = Depends(get_current_worker)
 ):
     """
     Manual clock-out for exceptions.
     """
-    clock_out_data.auto = False
-    return await clock_out(clock_out_data, db, current_worker)
+    response = perform_clock_out(db, current_worker, clock_out_data, is_auto=False)
+    background_tasks.add_task(refresh_attendance_daily_summary)
+    return response
 
 
 # ==========================================
 # HELPER FUNCTIONS
 # ==========================================
 
-def enrich_attendance_response(attendance: AutoAttendance, db: Session) -> AttendanceResponse:
-    """Add computed fields to attendance response"""
-    worker = db.query(Worker).filter(Worker.id == attendance.worker_id).first()
-    site = db.query(Site).filter(Site.id == attendance.site_id).first()
+def perform_clock_in(
+    db: Session,
+    worker: Worker,
+    data: AttendanceClockInRequest,
+    is_auto: bool
+) -> AttendanceResponse:
+    """Open a shift for the worker (shared by auto and manual clock-in)"""
+    # One timestamp for the whole request, so the "today" check and the
+    # stored clock_in_time agree even across midnight
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    
+    # Check if already clocked in today
+    today_start, tomorrow_start = day_range(today, today)
+    existing_attendance = db.query(AutoAttendance).filter(
+        AutoAttendance.worker_id == worker.id,
+        AutoAttendance.clock_in_time >= today_start,
+        AutoAttendance.clock_in_time < tomorrow_start,
+        AutoAttendance.clock_out_time == None
+    ).first()
+    
+    if existing_attendance:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Already clocked in. Clock out first."
+        )
+    
+    # Get site details
+    site = db.query(Site).filter(Site.id == data.site_id).first()
+    
+    if not site:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Site not found"
+        )
+    
+    # Validate GPS location is within geofence
+    geofence = (
+        float(data.gps_lat),
+        float(data.gps_lon),
+        float(site.gps_lat),
+        float(site.gps_lon),
+        float(site.radius_m)
+    )
+    is_valid = inside_geofence(*geofence)
+    
+    if not is_valid and is_auto:
+        # The distance in meters is only needed for the error message
+        distance = calculate_distance(*geofence[:4])
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Location outside geofence. Distance: {int(distance)}m, Required: {site.radius_m}m"
+        )
+    
+    # Create attendance record
+    attendance = AutoAttendance(
+        worker_id=worker.id,
+        site_id=data.site_id,
+        organization_id=worker.organization_id,
+        clock_in_time=now,
+        clock_in_gps_lat=data.gps_lat,
+        clock_in_gps_lon=data.gps_lon,
+        clock_in_accuracy_m=data.accuracy_m,
+        auto_clocked_in=is_auto,
+        device_id=data.device_id,
+        is_valid=is_valid,
+        worker_name=worker.name,
+        site_name=site.name
+    )
+    
+    db.add(attendance)
+    
+    # Flush fetches id/created_at via RETURNING; build the response before
+    # commit expires the instance so no re-SELECT is needed
+    db.flush()
+    response = AttendanceResponse.model_validate(attendance)
+    db.commit()
+    invalidate_attendance_summaries(worker.id)
+    
+    # TODO: Send notification to worker
+    
+    return response
+
+
+def perform_clock_out(
+    db: Session,
+    worker: Worker,
+    data: AttendanceClockOutRequest,
+    is_auto: bool
+) -> AttendanceResponse:
+    """Close the worker's open shift for today (shared by auto and manual clock-out)"""
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    
+    # Find today's open attendance record
+    today_start, tomorrow_start = day_range(today, today)
+    attendance = db.query(AutoAttendance).filter(
+        AutoAttendance.worker_id == worker.id,
+        AutoAttendance.clock_in_time >= today_start,
+        AutoAttendance.clock_in_time < tomorrow_start,
+        AutoAttendance.clock_out_time == None
+    ).first()
+    
+    if not attendance:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No active clock-in found. Clock in first."
+        )
+    
+    # Clock-out is allowed wherever the worker is (auto clock-outs inside
+    # the geofence included), so no geofence check is made here
     
-    attendance_dict = AttendanceResponse.model_validate(attendance).model_dump()
-    attendance_dict['worker_name'] = worker.name if worker else None
-    attendance_dict['site_name'] = site.name if site else None
+    # Update attendance record
+    attendance.clock_out_time = now
+    attendance.clock_out_gps_lat = data.gps_lat
+    attendance.clock_out_gps_lon = data.gps_lon
+    attendance.clock_out_accuracy_m = data.accuracy_m
+    attendance.auto_clocked_out = is_auto
+    
+    # total_hours (generated column) and updated_at (onupdate) are set by
+    # the database and come back in the UPDATE's RETURNING clause
+    db.flush()
+    response = AttendanceResponse.model_validate(attendance)
+    db.commit()
     
-    return AttendanceResponse(**attendance_dict)
+    # TODO: Send notification to worker with summary
+    
+    invalidate_attendance_summaries(worker.id)
+    
+    return response
 
 
 def get_attendance_summary(
@@ -313,44 +337,80 @@ def get_attendance_summary(
     period: str,
     db: Session
 ) -> AttendanceSummaryResponse:
-    """Calculate attendance summary for a date range"""
+    """Calculate attendance summary for a date range (cached per worker and day)"""
+    cache_key = (worker_id, period, utc_today())
+    summary = attendance_summary_cache.get(cache_key)
+    if summary is None:
+        summary = compute_attendance_summary(worker_id, start_date, end_date, period, db)
+        attendance_summary_cache.set(cache_key, summary)
+    return summary
+
+
+def compute_attendance_summary(
+    worker_id: int,
+    start_date: date,
+    end_date: date,
+    period: str,
+    db: Session
+) -> AttendanceSummaryResponse:
+    """Aggregate attendance and task totals for a date range"""
     from app.models.task import Task
     
     # Get worker
     worker = db.query(Worker).filter(Worker.id == worker_id).first()
     
-    # Count days present
-    days_present = db.query(
-        func.count(func.distinct(func.date(AutoAttendance.clock_in_time)))
-    ).filter(
-        AutoAttendance.worker_id == worker_id,
-        func.date(AutoAttendance.clock_in_time).between(start_date, end_date)
-    ).scalar() or 0
-    
-    # Sum total hours
-    total_hours = db.query(
-        func.sum(AutoAttendance.total_hours)
-    ).filter(
-        AutoAttendance.worker_id == worker_id,
-        func.date(AutoAttendance.clock_in_time).between(start_date, end_date)
-    ).scalar() or Decimal('0')
+    period_start, period_end = day_range(start_date, end_date)
     
-    # Calculate average
-    avg_hours = total_hours / days_present if days_present > 0 else Decimal('0')
+    # One row per day present: days before today from the daily summary
+    # view, today (not in the view yet) from the shifts themselves
+    today = utc_today()
+    day_rows = select(attendance_daily_summary.c.hours).where(
+        attendance_daily_summary.c.worker_id == worker_id,
+        attendance_daily_summary.c.day >= start_date,
+        attendance_daily_summary.c.day < min(end_date + timedelta(days=1), today)
+    )
     
-    # Count completed tasks in period
-    tasks_completed = db.query(Task).filter(
-        Task.worker_id == worker_id,
+    if start_date <= today <= end_date:
+        today_start, tomorrow_start = day_range(today, today)
+        day_rows = union_all(day_rows, select(func.sum(AutoAttendance.total_hours).label('hours')).where(
+            AutoAttendance.worker_id == worker_id,
+            AutoAttendance.clock_in_time >= today_start,
+            AutoAttendance.clock_in_time < tomorrow_start
+        ).having(func.count() > 0))
+    
+    days = day_rows.subquery()
+    hours_sum = func.coalesce(func.sum(days.c.hours), 0)
+    totals = db.query(
+        func.count().label('days'),
+        hours_sum.label('hours'),
+        func.coalesce(func.round(hours_sum / func.nullif(func.count(), 0), 2), 0).label('avg_hours')
+    ).select_from(days).one()
+    
+    days_present = totals.days
+    total_hours = totals.hours
+    avg_hours = totals.avg_hours
+    
+    # Completed and assigned task counts in one pass (FILTER per aggregate)
+    completed_in_period = and_(
         Task.status == 'completed',
-        func.date(Task.completed_at).between(start_date, end_date)
-    ).count()
-    
-    # Count total assigned tasks in period
-    total_tasks = db.query(Task).filter(
-        Task.worker_id == worker_id,
-        func.date(Task.created_at).between(start_date, end_date),
+        Task.completed_at >= period_start,
+        Task.completed_at < period_end
+    )
+    assigned_in_period = and_(
+        Task.created_at >= period_start,
+        Task.created_at < period_end,
         Task.deleted_at == None
-    ).count()
+    )
+    task_totals = db.query(
+        func.count().filter(completed_in_period).label('completed'),
+        func.count().filter(assigned_in_period).label('total')
+    ).filter(
+        Task.worker_id == worker_id,
+        or_(completed_in_period, assigned_in_period)
+    ).one()
+    
+    tasks_completed = task_totals.completed
+    total_tasks = task_totals.total
     
     completion_rate = (tasks_completed / total_tasks * 100) if total_tasks > 0 else 0
     
@@ -363,4 +423,13 @@ def get_attendance_summary(
         avg_hours_per_day=avg_hours,
         tasks_completed=tasks_completed,
         completion_rate=round(completion_rate, 1)
-    )
\ No newline at end of file
+    )
+
+
+# Refresh the daily summary view at most this often per process
+SUMMARY_REFRESH_INTERVAL = timedelta(minutes=10)
+
+
+def refresh_attendance_daily_summary():
+    """Refresh attendance_daily_summary without blocking readers (background task)"""
+    refresh_materialized_view("attendance_daily_summary", SUMMARY_REFRESH_INTERVAL)
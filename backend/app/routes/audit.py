@@ -2,17 +2,21 @@
 Stage 2.5: Audit Log API
 Track all system events for compliance and security
 """
+import orjson
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, func, desc, true, text, tuple_
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from pydantic import BaseModel, Field
 
 from app.database import get_db
 from app.models.audit_log import AuditLog
 from app.models.user import User
 from app.routes.auth import get_current_user
+from app.utils.cache import audit_recent_cache, audit_stats_cache
+from app.utils.pagination import encode_cursor, decode_cursor
 
 
 router = APIRouter()
@@ -39,11 +43,60 @@ class AuditLogResponse(BaseModel):
 
 class AuditLogListResponse(BaseModel):
     logs: List[AuditLogResponse]
-    total_count: int
+    total_count: Optional[int] = None  # Only with include_count=true
+    has_next: bool
+    next_cursor: Optional[str] = None  # Pass as `cursor` to get the next page
     page: int
     page_size: int
 
 
+# Columns of AuditLogResponse, fetched as plain rows (no ORM objects)
+AUDIT_LOG_COLUMNS = (
+    AuditLog.id,
+    AuditLog.user_id,
+    User.email.label("user_email"),
+    AuditLog.action,
+    AuditLog.entity_type,
+    AuditLog.entity_id,
+    AuditLog.details,
+    AuditLog.ip_address,
+    AuditLog.created_at,
+)
+
+
+def audit_log_rows(db: Session, *filters):
+    """Audit log response rows matching filters, newest first"""
+    return db.query(*AUDIT_LOG_COLUMNS).outerjoin(
+        User, User.id == AuditLog.user_id
+    ).filter(*filters).order_by(AuditLog.created_at.desc(), AuditLog.id.desc())
+
+
+# ============================================================================
+# DEPENDENCIES
+# ============================================================================
+
+def require_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Only admins can view audit logs"""
+    if current_user.role not in ["admin", "super_admin"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view audit logs"
+        )
+    return current_user
+
+
+def require_admin_org_filter(current_user: User = Depends(require_admin)):
+    """Filter clause limiting audit logs to the caller's organization"""
+    if current_user.organization_id == 1:  # Super admin sees everything
+        return true()
+    return or_(
+        AuditLog.organization_id == current_user.organization_id,
+        # System actions only; user rows without an organization may belong
+        # to another tenant
+        and_(AuditLog.organization_id.is_(None), AuditLog.user_id.is_(None))
+    )
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
@@ -53,12 +106,15 @@ async def list_audit_logs(
     action: Optional[str] = Query(None, description="Filter by action type (login, create, update, delete)"),
     entity_type: Optional[str] = Query(None, description="Filter by entity (worker, site, user, etc)"),
     user_id: Optional[int] = Query(None, description="Filter by user who performed action"),
-    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    start_date: Optional[date] = Query(None, description="Start date (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="End date (YYYY-MM-DD)"),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page (preferred over page)"),
+    include_count: bool = Query(False, description="Also return total_count (slower)"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_admin),
+    org_filter = Depends(require_admin_org_filter)
 ):
     """
     Query audit logs for compliance and security tracking.
@@ -76,96 +132,61 @@ async def list_audit_logs(
     
     **Entity Types:**
     - worker, site, user, organization, checkpoint, device
-    """
-    # Only admins can view audit logs
-    if current_user.role not in ["admin", "super_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can view audit logs"
-        )
     
-    # Build query
-    query = db.query(AuditLog)
-    
-    # Apply organization filter (non-super admin)
-    if current_user.organization_id != 1:  # Not super admin
-        # Filter to only show logs from their organization
-        # Get all user IDs in the organization
-        from app.models.user import User as UserModel
-        org_user_ids = db.query(UserModel.id).filter(
-            UserModel.organization_id == current_user.organization_id
-        ).all()
-        org_user_ids = [uid[0] for uid in org_user_ids]
-        
-        query = query.filter(
-            or_(
-                AuditLog.user_id.in_(org_user_ids),
-                AuditLog.user_id.is_(None)  # Include system actions
-            )
-        )
+    **Paging:** pass the previous response's `next_cursor` as `cursor`;
+    unlike `page`, deep pages stay fast. `total_count` is only computed
+    when `include_count=true`.
+    """
+    # Build filters, scoped to the caller's organization
+    filters = [org_filter]
     
     # Apply filters
     if action:
-        query = query.filter(AuditLog.action == action)
+        filters.append(AuditLog.action == action)
     
     if entity_type:
-        query = query.filter(AuditLog.entity_type == entity_type)
+        filters.append(AuditLog.entity_type == entity_type)
     
     if user_id:
-        query = query.filter(AuditLog.user_id == user_id)
+        filters.append(AuditLog.user_id == user_id)
     
     if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(AuditLog.created_at >= start_dt)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid start_date format. Use YYYY-MM-DD"
-            )
+        filters.append(AuditLog.created_at >= datetime.combine(start_date, time.min))
     
     if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-            query = query.filter(AuditLog.created_at < end_dt)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid end_date format. Use YYYY-MM-DD"
-            )
+        filters.append(AuditLog.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
     
     # Get total count
-    total_count = query.count()
-    
-    # Apply pagination and ordering
-    logs = query.order_by(AuditLog.created_at.desc()).offset(
-        (page - 1) * page_size
-    ).limit(page_size).all()
-    
-    # Build responses with user info
-    results = []
-    for log in logs:
-        user_email = None
-        if log.user_id:
-            user = db.query(User).filter(User.id == log.user_id).first()
-            if user:
-                user_email = user.email
-        
-        results.append(AuditLogResponse(
-            id=log.id,
-            user_id=log.user_id,
-            user_email=user_email,
-            action=log.action,
-            entity_type=log.entity_type,
-            entity_id=log.entity_id,
-            details=log.details,
-            ip_address=log.ip_address,
-            created_at=log.created_at
-        ))
+    total_count = None
+    if include_count:
+        if current_user.organization_id == 1 and len(filters) == 1:
+            # Whole table: the planner's estimate is close enough and free
+            # (-1 until the table has been analyzed)
+            total_count = db.execute(
+                text("SELECT reltuples::BIGINT FROM pg_class WHERE relname = 'audit_logs'")
+            ).scalar()
+        if total_count is None or total_count < 0:
+            total_count = db.query(func.count(AuditLog.id)).filter(*filters).scalar()
+    
+    # Apply pagination and ordering; one extra row tells us if there's a next page
+    query = audit_log_rows(db, *filters)
+    if cursor:
+        query = query.filter(tuple_(AuditLog.created_at, AuditLog.id) < tuple_(*decode_cursor(cursor)))
+    else:
+        query = query.offset((page - 1) * page_size)
+    rows = query.limit(page_size + 1).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_next else None
+    
+    # Rows come straight from the database; skip re-validation
+    results = [AuditLogResponse.model_construct(**row._mapping) for row in rows]
     
     return AuditLogListResponse(
         logs=results,
         total_count=total_count,
+        has_next=has_next,
+        next_cursor=next_cursor,
         page=page,
         page_size=page_size
     )
@@ -175,59 +196,23 @@ async def list_audit_logs(
 async def get_recent_audit_logs(
     limit: int = Query(20, ge=1, le=100),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_admin),
+    org_filter = Depends(require_admin_org_filter)
 ):
     """
     Get most recent audit logs.
     
     Quick view of latest system activity.
     """
-    if current_user.role not in ["admin", "super_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can view audit logs"
-        )
-    
-    query = db.query(AuditLog)
-    
-    # Apply organization filter
-    if current_user.organization_id != 1:
-        from app.models.user import User as UserModel
-        org_user_ids = db.query(UserModel.id).filter(
-            UserModel.organization_id == current_user.organization_id
-        ).all()
-        org_user_ids = [uid[0] for uid in org_user_ids]
-        
-        query = query.filter(
-            or_(
-                AuditLog.user_id.in_(org_user_ids),
-                AuditLog.user_id.is_(None)
-            )
-        )
+    cache_key = ("recent", current_user.organization_id, limit)
+    cached = audit_recent_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
-    logs = query.order_by(AuditLog.created_at.desc()).limit(limit).all()
-    
-    # Build responses
-    results = []
-    for log in logs:
-        user_email = None
-        if log.user_id:
-            user = db.query(User).filter(User.id == log.user_id).first()
-            if user:
-                user_email = user.email
-        
-        results.append(AuditLogResponse(
-            id=log.id,
-            user_id=log.user_id,
-            user_email=user_email,
-            action=log.action,
-            entity_type=log.entity_type,
-            entity_id=log.entity_id,
-            details=log.details,
-            ip_address=log.ip_address,
-            created_at=log.created_at
-        ))
+    rows = audit_log_rows(db, org_filter).limit(limit).all()
+    results = [AuditLogResponse.model_construct(**row._mapping) for row in rows]
     
+    audit_recent_cache.set(cache_key, results)
     return results
 
 
@@ -235,7 +220,8 @@ async def get_recent_audit_logs(
 async def get_audit_stats(
     days: int = Query(7, ge=1, le=90),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_admin),
+    org_filter = Depends(require_admin_org_filter)
 ):
     """
     Get audit log statistics for the specified period.
@@ -245,90 +231,56 @@ async def get_audit_stats(
     - Most active users
     - Most modified entities
     """
-    if current_user.role not in ["admin", "super_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can view audit statistics"
-        )
+    cache_key = ("stats", current_user.organization_id, days)
+    cached = audit_stats_cache.get(cache_key)
+    if cached is not None:
+        return cached
     
     # Date range
     start_date = datetime.utcnow() - timedelta(days=days)
     
-    query = db.query(AuditLog).filter(AuditLog.created_at >= start_date)
-    
-    # Apply organization filter
-    if current_user.organization_id != 1:
-        from app.models.user import User as UserModel
-        org_user_ids = db.query(UserModel.id).filter(
-            UserModel.organization_id == current_user.organization_id
-        ).all()
-        org_user_ids = [uid[0] for uid in org_user_ids]
-        
-        query = query.filter(
-            or_(
-                AuditLog.user_id.in_(org_user_ids),
-                AuditLog.user_id.is_(None)
-            )
-        )
-    
-    all_logs = query.all()
+    filters = [AuditLog.created_at >= start_date, org_filter]
     
-    # Count by action
-    action_counts = {}
-    entity_counts = {}
-    user_counts = {}
-    
-    for log in all_logs:
-        # Count actions
-        action_counts[log.action] = action_counts.get(log.action, 0) + 1
-        
-        # Count entities
-        entity_counts[log.entity_type] = entity_counts.get(log.entity_type, 0) + 1
-        
-        # Count users
-        if log.user_id:
-            user_counts[log.user_id] = user_counts.get(log.user_id, 0) + 1
+    # Count in the database instead of loading every log
+    action_counts = dict(
+        db.query(AuditLog.action, func.count()).filter(*filters).group_by(AuditLog.action).all()
+    )
+    entity_counts = dict(
+        db.query(AuditLog.entity_type, func.count()).filter(*filters).group_by(AuditLog.entity_type).all()
+    )
     
     # Get top users
-    top_users = []
-    for user_id, count in sorted(user_counts.items(), key=lambda x: x[1], reverse=True)[:5]:
-        user = db.query(User).filter(User.id == user_id).first()
-        if user:
-            top_users.append({
-                "user_id": user_id,
-                "email": user.email,
-                "action_count": count
-            })
-    
-    return {
+    action_count = func.count().label("action_count")
+    top_user_rows = db.query(AuditLog.user_id, User.email, action_count).join(
+        User, User.id == AuditLog.user_id
+    ).filter(*filters).group_by(AuditLog.user_id, User.email).order_by(
+        desc(action_count)
+    ).limit(5).all()
+    
+    top_users = [
+        {"user_id": user_id, "email": email, "action_count": count}
+        for user_id, email, count in top_user_rows
+    ]
+    
+    stats = {
         "period_days": days,
-        "total_actions": len(all_logs),
+        "total_actions": sum(action_counts.values()),
         "actions_by_type": action_counts,
         "entities_by_type": entity_counts,
         "most_active_users": top_users
     }
+    audit_stats_cache.set(cache_key, stats)
+    return stats
 
 
-@router.get("/user/{user_id}")
-async def get_user_audit_trail(
+def user_audit_trail_query(
+    db: Session,
+    current_user: User,
     user_id: int,
-    start_date: Optional[str] = Query(None),
-    end_date: Optional[str] = Query(None),
-    limit: int = Query(50, ge=1, le=200),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    start_date: Optional[date],
+    end_date: Optional[date]
 ):
-    """
-    Get complete audit trail for a specific user.
-    
-    Useful for investigating user activity or compliance reviews.
-    """
-    if current_user.role not in ["admin", "super_admin"]:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only administrators can view user audit trails"
-        )
-    
+    """Check access to a user's audit trail; returns (target_user, rows query)"""
     # Verify user exists and check permissions
     target_user = db.query(User).filter(User.id == user_id).first()
     if not target_user:
@@ -345,51 +297,68 @@ async def get_user_audit_trail(
                 detail="Can only view audit trails for users in your organization"
             )
     
-    # Build query
-    query = db.query(AuditLog).filter(AuditLog.user_id == user_id)
+    filters = [AuditLog.user_id == user_id]
     
     # Apply date filters
     if start_date:
-        try:
-            start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-            query = query.filter(AuditLog.created_at >= start_dt)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid start_date format. Use YYYY-MM-DD"
-            )
+        filters.append(AuditLog.created_at >= datetime.combine(start_date, time.min))
     
     if end_date:
-        try:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
-            query = query.filter(AuditLog.created_at < end_dt)
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Invalid end_date format. Use YYYY-MM-DD"
-            )
+        filters.append(AuditLog.created_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    
+    return target_user, audit_log_rows(db, *filters)
+
+
+@router.get("/user/{user_id}")
+async def get_user_audit_trail(
+    user_id: int,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Get complete audit trail for a specific user.
+    
+    Useful for investigating user activity or compliance reviews.
+    For long trails use `/user/{user_id}/stream`.
+    """
+    target_user, query = user_audit_trail_query(db, current_user, user_id, start_date, end_date)
     
     # Get logs
-    logs = query.order_by(AuditLog.created_at.desc()).limit(limit).all()
-    
-    # Build responses
-    results = []
-    for log in logs:
-        results.append(AuditLogResponse(
-            id=log.id,
-            user_id=log.user_id,
-            user_email=target_user.email,
-            action=log.action,
-            entity_type=log.entity_type,
-            entity_id=log.entity_id,
-            details=log.details,
-            ip_address=log.ip_address,
-            created_at=log.created_at
-        ))
+    rows = query.limit(limit).all()
+    results = [AuditLogResponse.model_construct(**row._mapping) for row in rows]
     
     return {
         "user_id": user_id,
         "user_email": target_user.email,
         "total_actions": len(results),
         "audit_trail": results
-    }
\ No newline at end of file
+    }
+
+
+@router.get("/user/{user_id}/stream")
+def stream_user_audit_trail(
+    user_id: int,
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, description="Defaults to the whole trail"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_admin)
+):
+    """
+    Stream a user's audit trail as NDJSON (one log per line, newest first)
+    
+    Rows are fetched from a server-side cursor in batches, so memory use
+    doesn't grow with the length of the trail.
+    """
+    _, query = user_audit_trail_query(db, current_user, user_id, start_date, end_date)
+    if limit:
+        query = query.limit(limit)
+    
+    def generate():
+        for row in query.yield_per(200):
+            yield orjson.dumps(row._asdict()) + b"\n"
+    
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,20 +1,25 @@
 from datetime import datetime, timedelta
 from typing import Optional, List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from sqlalchemy import select
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from sqlalchemy.orm import Session, undefer, selectinload
+from sqlalchemy import select, update, exists, func, text
+import jwt
+from jwt import InvalidTokenError as JWTError
 from pydantic import BaseModel, EmailStr  # UPDATED: Added EmailStr
 
-from app.database import get_db
+from app.database import get_db, get_engine
 from app.models.user import User, Organization  # UPDATED: Added Organization
-from app.core.config import settings
+from app.core.config import Settings, get_settings
+from app.models.site import Site
+from app.utils.security import pwd_context
+from app.utils.cache import current_user_cache
 
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
+
+SELECT_ASSIGNED_SITES = text("SELECT site_id FROM user_sites WHERE user_id = :user_id")
+INSERT_USER_SITE = text("INSERT INTO user_sites (user_id, site_id) VALUES (:user_id, :site_id)")
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{get_settings().API_V1_STR}/auth/login")
 
 
 # Pydantic schemas
@@ -57,6 +62,7 @@ def get_password_hash(password):
 
 
 def create_access_token(data: dict):
+    settings = get_settings()
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
@@ -64,7 +70,11 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+    settings: Settings = Depends(get_settings)
+) -> User:
     """Dependency to get current authenticated user"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -79,30 +89,54 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.email == email).first()
+    user = current_user_cache.get(email)
     if user is None:
-        raise credentials_exception
-    return user
+        user = db.query(User).filter(func.lower(User.email) == email.lower()).one_or_none()
+        if user is None:
+            raise credentials_exception
+        # Cache a detached copy; each request gets its own session-bound one
+        db.expunge(user)
+        current_user_cache.set(email, user)
+    return db.merge(user, load=False)
 
 
 def get_assigned_sites(user_id: int, db: Session) -> List[int]:
     """Get list of site IDs assigned to a user"""
-    from sqlalchemy import text
-    result = db.execute(
-        text("SELECT site_id FROM user_sites WHERE user_id = :user_id"),
-        {"user_id": user_id}
-    )
+    result = db.execute(SELECT_ASSIGNED_SITES, {"user_id": user_id})
     return [row[0] for row in result]
 
 
+def update_last_login(user_id: int, logged_in_at: datetime, password: Optional[str] = None):
+    """
+    Record a login after the response is sent (background task).
+    
+    If `password` is given, the stored hash is outdated (e.g. bcrypt)
+    and is replaced with a fresh argon2 hash in the same UPDATE.
+    """
+    values = {"last_login": logged_in_at}
+    if password is not None:
+        values["hashed_password"] = get_password_hash(password)
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(update(User).where(User.id == user_id).values(**values))
+    except Exception as e:
+        print(f"⚠️ Could not update last_login for user {user_id}: {str(e)}")
+
+
 @router.post("/login", response_model=Token)
-async def login(
+def login(
+    background_tasks: BackgroundTasks,
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
     """Login endpoint - returns JWT token + user info"""
-    # Find user
-    user = db.query(User).filter(User.email == form_data.username).first()
+    # Find user, with manager site assignments loaded alongside
+    user = db.query(User).options(
+        undefer(User.hashed_password),
+        selectinload(User.assigned_sites).load_only(Site.id)
+    ).filter(
+        func.lower(User.email) == form_data.username.lower()
+    ).one_or_none()
     
     if not user or not verify_password(form_data.password, user.hashed_password):
         raise HTTPException(
@@ -113,35 +147,36 @@ async def login(
     if not user.is_active:
         raise HTTPException(status_code=403, detail="User account is inactive")
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
-    
     # Get assigned sites
     assigned_sites = []
     if user.user_mode == "manager":  # CHANGED: mode → user_mode
-        assigned_sites = get_assigned_sites(user.id, db)
+        assigned_sites = [site.id for site in user.assigned_sites]
     elif user.user_mode == "admin":  # CHANGED: mode → user_mode
         # Admins see all sites in their organization
-        from app.models.site import Site
-        sites = db.query(Site).filter(Site.organization_id == user.organization_id).all()
+        sites = db.query(Site.id).filter(Site.organization_id == user.organization_id).all()
         assigned_sites = [site.id for site in sites]
     
+    user_info = {
+        "id": user.id,
+        "email": user.email,
+        "full_name": user.full_name,
+        "role": user.role,
+        "mode": user.user_mode,  # CHANGED: Send as "mode" for API compatibility
+        "assigned_sites": assigned_sites,
+        "organization_id": user.organization_id
+    }
+    
+    # Update last login (and upgrade an outdated hash) off the request path
+    rehash_password = form_data.password if pwd_context.needs_update(user.hashed_password) else None
+    background_tasks.add_task(update_last_login, user.id, datetime.utcnow(), rehash_password)
+    
     # Create token
-    access_token = create_access_token(data={"sub": user.email})
+    access_token = create_access_token(data={"sub": user_info["email"]})
     
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": {
-            "id": user.id,
-            "email": user.email,
-            "full_name": user.full_name,
-            "role": user.role,
-            "mode": user.user_mode,  # CHANGED: Send as "mode" for API compatibility
-            "assigned_sites": assigned_sites,
-            "organization_id": user.organization_id
-        }
+        "user": user_info
     }
 
 
@@ -164,7 +199,7 @@ async def get_me(current_user: User = Depends(get_current_user), db: Session = D
 
 # NEW: Organization Registration Endpoint
 @router.post("/register/organization", status_code=201)
-async def register_organization(
+def register_organization(
     registration: OrganizationRegistration,
     db: Session = Depends(get_db)
 ):
@@ -175,17 +210,19 @@ async def register_organization(
     1. Organization with trial subscription
     2. Admin user for that organization
     """
-    # Check if email already exists
-    existing_user = db.query(User).filter(User.email == registration.email).first()
-    if existing_user:
+    # Check email and organization name in one round-trip
+    email_taken, org_taken = db.execute(select(
+        exists().where(func.lower(User.email) == registration.email.lower()),
+        exists().where(Organization.name == registration.organization_name)
+    )).one()
+    
+    if email_taken:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    # Check if organization name already exists
-    existing_org = db.query(Organization).filter(Organization.name == registration.organization_name).first()
-    if existing_org:
+    if org_taken:
         raise HTTPException(
             status_code=400,
             detail="Organization name already taken"
@@ -216,21 +253,22 @@ async def register_organization(
         is_active=True
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_org)
-    db.refresh(new_user)
     
-    return {
+    # Everything in the response is already known; no refresh after commit
+    response = {
         "message": "Organization created successfully",
         "organization_id": new_org.id,
         "organization_name": new_org.name,
         "admin_email": new_user.email,
         "subscription_status": new_org.subscription_status
     }
+    db.commit()
+    
+    return response
 
 
 @router.post("/register")
-async def register_test_user(
+def register_test_user(
     email: str,
     password: str,
     full_name: str,
@@ -240,7 +278,7 @@ async def register_test_user(
     db: Session = Depends(get_db)
 ):
     """Test endpoint to create users"""
-    existing = db.query(User).filter(User.email == email).first()
+    existing = db.query(User).filter(func.lower(User.email) == email.lower()).one_or_none()
     if existing:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -258,12 +296,10 @@ async def register_test_user(
     
     # Assign sites
     if assigned_site_ids:
-        from sqlalchemy import text
-        for site_id in assigned_site_ids:
-            db.execute(
-                text("INSERT INTO user_sites (user_id, site_id) VALUES (:user_id, :site_id)"),
-                {"user_id": user.id, "site_id": site_id}
-            )
+        db.execute(
+            INSERT_USER_SITE,
+            [{"user_id": user.id, "site_id": site_id} for site_id in assigned_site_ids]
+        )
         db.commit()
     
     return {
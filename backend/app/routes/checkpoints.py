@@ -3,16 +3,20 @@ Stage 2.5: Checkpoints API
 Preparing for NFC implementation in Stage 6
 """
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import Float, and_, func
+from typing import Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, Field
 
 from app.database import get_db
 from app.models.checkpoint import Checkpoint
+from app.models.event import ClockEvent
 from app.models.site import Site
 from app.models.user import User
+from app.models.user_site import UserSite
 from app.routes.auth import get_current_user
+from app.routes.sites import can_access_site
 
 
 router = APIRouter()
@@ -70,56 +74,47 @@ class CheckpointListResponse(BaseModel):
 # HELPER FUNCTIONS
 # ============================================================================
 
-def can_access_site(user: User, site_id: int, db: Session) -> bool:
-    """Check if user can access this site"""
-    # Super admin (org_id=1) can access everything
-    if user.organization_id == 1:
-        return True
-    
-    # Check if site belongs to user's organization
-    site = db.query(Site).filter(Site.id == site_id).first()
-    if not site:
-        return False
-    
-    if site.organization_id != user.organization_id:
-        return False
-    
-    # Admins can access all sites in their org
-    if user.role == "admin":
-        return True
-    
-    # Managers need to be assigned to the site
-    if user.role == "manager":
-        from app.models.user import user_sites
-        assigned = db.query(user_sites).filter(
-            user_sites.c.user_id == user.id,
-            user_sites.c.site_id == site_id
-        ).first()
-        return assigned is not None
-    
-    return False
+CHECKPOINT_TYPES = frozenset({"entrance", "exit", "patrol", "other"})
+INVALID_CHECKPOINT_TYPE = "Invalid checkpoint_type. Must be one of: entrance, exit, patrol, other"
+
+# Columns of CheckpointResponse that come from the database (stats are added separately)
+CHECKPOINT_LIST_COLUMNS = (
+    Checkpoint.id,
+    Checkpoint.site_id,
+    Site.name.label("site_name"),
+    Checkpoint.name,
+    Checkpoint.description,
+    Checkpoint.checkpoint_type,
+    # Numeric columns; cast so rows match the schema's float fields
+    Checkpoint.gps_lat.cast(Float).label("gps_lat"),
+    Checkpoint.gps_lon.cast(Float).label("gps_lon"),
+    Checkpoint.nfc_tag_id,
+    Checkpoint.qr_code,
+    Checkpoint.is_active,
+    Checkpoint.created_at,
+    Checkpoint.updated_at,
+)
+
+
+def get_checkpoint_stats_bulk(checkpoint_ids: List[int], db: Session) -> Dict[int, dict]:
+    """Get usage statistics for many checkpoints in one aggregate query"""
+    rows = db.query(
+        ClockEvent.checkpoint_id,
+        func.count(),
+        func.max(ClockEvent.event_timestamp)
+    ).filter(
+        ClockEvent.checkpoint_id.in_(checkpoint_ids)
+    ).group_by(ClockEvent.checkpoint_id).all()
+    
+    stats = {cp_id: {"total_scans": 0, "last_used": None} for cp_id in checkpoint_ids}
+    for cp_id, total_scans, last_used in rows:
+        stats[cp_id] = {"total_scans": total_scans, "last_used": last_used}
+    return stats
 
 
 def get_checkpoint_stats(checkpoint_id: int, db: Session) -> dict:
     """Get checkpoint usage statistics"""
-    from app.models.event import ClockEvent
-    
-    # Count scans
-    total_scans = db.query(ClockEvent).filter(
-        ClockEvent.checkpoint_id == checkpoint_id
-    ).count()
-    
-    # Get last used
-    last_event = db.query(ClockEvent).filter(
-        ClockEvent.checkpoint_id == checkpoint_id
-    ).order_by(ClockEvent.event_timestamp.desc()).first()
-    
-    last_used = last_event.event_timestamp if last_event else None
-    
-    return {
-        "total_scans": total_scans,
-        "last_used": last_used
-    }
+    return get_checkpoint_stats_bulk([checkpoint_id], db)[checkpoint_id]
 
 
 # ============================================================================
@@ -127,7 +122,7 @@ def get_checkpoint_stats(checkpoint_id: int, db: Session) -> dict:
 # ============================================================================
 
 @router.post("/", response_model=CheckpointResponse, status_code=status.HTTP_201_CREATED)
-async def create_checkpoint(
+def create_checkpoint(
     checkpoint: CheckpointCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -147,8 +142,8 @@ async def create_checkpoint(
             detail="Not authorized to create checkpoints at this site"
         )
     
-    # Validate site exists
-    site = db.query(Site).filter(Site.id == checkpoint.site_id).first()
+    # Validate site exists (usually already in the session from the access check)
+    site = db.get(Site, checkpoint.site_id)
     if not site:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,18 +151,16 @@ async def create_checkpoint(
         )
     
     # Validate checkpoint type
-    valid_types = ["entrance", "exit", "patrol", "other"]
-    if checkpoint.checkpoint_type not in valid_types:
+    if checkpoint.checkpoint_type not in CHECKPOINT_TYPES:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Invalid checkpoint_type. Must be one of: {', '.join(valid_types)}"
+            detail=INVALID_CHECKPOINT_TYPE
         )
     
     # Check for duplicate NFC tag
     if checkpoint.nfc_tag_id:
-        existing = db.query(Checkpoint).filter(
-            Checkpoint.nfc_tag_id == checkpoint.nfc_tag_id,
-            Checkpoint.deleted_at.is_(None)
+        existing = db.query(Checkpoint.id).filter(
+            Checkpoint.nfc_tag_id == checkpoint.nfc_tag_id
         ).first()
         if existing:
             raise HTTPException(
@@ -188,6 +181,8 @@ async def create_checkpoint(
         is_active=checkpoint.is_active
     )
     
+    site_name = site.name  # Read before commit expires it
+    
     db.add(new_checkpoint)
     db.commit()
     db.refresh(new_checkpoint)
@@ -198,7 +193,7 @@ async def create_checkpoint(
     return CheckpointResponse(
         id=new_checkpoint.id,
         site_id=new_checkpoint.site_id,
-        site_name=site.name,
+        site_name=site_name,
         name=new_checkpoint.name,
         description=new_checkpoint.description,
         checkpoint_type=new_checkpoint.checkpoint_type,
@@ -215,7 +210,7 @@ async def create_checkpoint(
 
 
 @router.get("/", response_model=CheckpointListResponse)
-async def list_checkpoints(
+def list_checkpoints(
     site_id: Optional[int] = None,
     checkpoint_type: Optional[str] = None,
     is_active: Optional[bool] = None,
@@ -234,26 +229,25 @@ async def list_checkpoints(
     - checkpoint_type: entrance, exit, patrol, other
     - is_active: true/false
     """
-    query = db.query(Checkpoint).filter(Checkpoint.deleted_at.is_(None))
+    # Plain column rows (site name joined in); list responses don't need ORM objects
+    query = db.query(*CHECKPOINT_LIST_COLUMNS).join(
+        Site, Checkpoint.site_id == Site.id
+    )
     
-    # Apply permissions
+    # Apply permissions in the same query
     if current_user.organization_id != 1:  # Not super admin
-        if current_user.role == "admin":
-            # Admin sees all sites in their org
-            site_ids = db.query(Site.id).filter(
-                Site.organization_id == current_user.organization_id
-            ).all()
-            site_ids = [s[0] for s in site_ids]
-            query = query.filter(Checkpoint.site_id.in_(site_ids))
+        query = query.filter(
+            Site.organization_id == current_user.organization_id,
+            Site.deleted_at.is_(None)
+        )
         
-        elif current_user.role == "manager":
+        # Admin sees all sites in their org
+        if current_user.role == "manager":
             # Manager sees only assigned sites
-            from app.models.user import user_sites
-            site_ids = db.query(user_sites.c.site_id).filter(
-                user_sites.c.user_id == current_user.id
-            ).all()
-            site_ids = [s[0] for s in site_ids]
-            query = query.filter(Checkpoint.site_id.in_(site_ids))
+            query = query.join(UserSite, and_(
+                UserSite.site_id == Site.id,
+                UserSite.user_id == current_user.id
+            ))
     
     # Apply filters
     if site_id:
@@ -272,31 +266,16 @@ async def list_checkpoints(
         query = query.filter(Checkpoint.is_active == is_active)
     
     # Execute
-    checkpoints = query.all()
+    rows = query.all()
     
-    # Build responses
-    results = []
-    for cp in checkpoints:
-        site = db.query(Site).filter(Site.id == cp.site_id).first()
-        stats = get_checkpoint_stats(cp.id, db)
-        
-        results.append(CheckpointResponse(
-            id=cp.id,
-            site_id=cp.site_id,
-            site_name=site.name if site else "Unknown",
-            name=cp.name,
-            description=cp.description,
-            checkpoint_type=cp.checkpoint_type,
-            gps_lat=cp.gps_lat,
-            gps_lon=cp.gps_lon,
-            nfc_tag_id=cp.nfc_tag_id,
-            qr_code=cp.qr_code,
-            is_active=cp.is_active,
-            created_at=cp.created_at,
-            updated_at=cp.updated_at,
-            last_used=stats["last_used"],
-            total_scans=stats["total_scans"]
-        ))
+    # Scan stats for the whole page in one query
+    all_stats = get_checkpoint_stats_bulk([row.id for row in rows], db)
+    
+    # Rows come straight from the database, so skip per-field validation
+    results = [
+        CheckpointResponse.model_construct(**row._asdict(), **all_stats[row.id])
+        for row in rows
+    ]
     
     return CheckpointListResponse(
         checkpoints=results,
@@ -305,16 +284,14 @@ async def list_checkpoints(
 
 
 @router.get("/{checkpoint_id}", response_model=CheckpointResponse)
-async def get_checkpoint(
+def get_checkpoint(
     checkpoint_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get details of a specific checkpoint"""
-    checkpoint = db.query(Checkpoint).filter(
-        Checkpoint.id == checkpoint_id,
-        Checkpoint.deleted_at.is_(None)
-    ).first()
+    # Primary-key lookup; the joined site also serves can_access_site's db.get
+    checkpoint = db.get(Checkpoint, checkpoint_id, options=[joinedload(Checkpoint.site)])
     
     if not checkpoint:
         raise HTTPException(
@@ -329,13 +306,12 @@ async def get_checkpoint(
             detail="Not authorized to view this checkpoint"
         )
     
-    site = db.query(Site).filter(Site.id == checkpoint.site_id).first()
     stats = get_checkpoint_stats(checkpoint.id, db)
     
     return CheckpointResponse(
         id=checkpoint.id,
         site_id=checkpoint.site_id,
-        site_name=site.name if site else "Unknown",
+        site_name=checkpoint.site.name if checkpoint.site else "Unknown",
         name=checkpoint.name,
         description=checkpoint.description,
         checkpoint_type=checkpoint.checkpoint_type,
@@ -352,7 +328,7 @@ async def get_checkpoint(
 
 
 @router.put("/{checkpoint_id}", response_model=CheckpointResponse)
-async def update_checkpoint(
+def update_checkpoint(
     checkpoint_id: int,
     update_data: CheckpointUpdate,
     db: Session = Depends(get_db),
@@ -366,10 +342,8 @@ async def update_checkpoint(
     - Associate NFC tags (Stage 6)
     - Activate/deactivate checkpoints
     """
-    checkpoint = db.query(Checkpoint).filter(
-        Checkpoint.id == checkpoint_id,
-        Checkpoint.deleted_at.is_(None)
-    ).first()
+    # Primary-key lookup; the joined site also serves can_access_site's db.get
+    checkpoint = db.get(Checkpoint, checkpoint_id, options=[joinedload(Checkpoint.site)])
     
     if not checkpoint:
         raise HTTPException(
@@ -386,19 +360,17 @@ async def update_checkpoint(
     
     # Validate checkpoint type if provided
     if update_data.checkpoint_type:
-        valid_types = ["entrance", "exit", "patrol", "other"]
-        if update_data.checkpoint_type not in valid_types:
+        if update_data.checkpoint_type not in CHECKPOINT_TYPES:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid checkpoint_type. Must be one of: {', '.join(valid_types)}"
+                detail=INVALID_CHECKPOINT_TYPE
             )
     
     # Check for duplicate NFC tag if updating
     if update_data.nfc_tag_id and update_data.nfc_tag_id != checkpoint.nfc_tag_id:
-        existing = db.query(Checkpoint).filter(
+        existing = db.query(Checkpoint.id).filter(
             Checkpoint.nfc_tag_id == update_data.nfc_tag_id,
-            Checkpoint.id != checkpoint_id,
-            Checkpoint.deleted_at.is_(None)
+            Checkpoint.id != checkpoint_id
         ).first()
         if existing:
             raise HTTPException(
@@ -412,17 +384,17 @@ async def update_checkpoint(
         setattr(checkpoint, field, value)
     
     checkpoint.updated_at = datetime.utcnow()
+    site_name = checkpoint.site.name if checkpoint.site else "Unknown"  # Read before commit expires it
     
     db.commit()
     db.refresh(checkpoint)
     
-    site = db.query(Site).filter(Site.id == checkpoint.site_id).first()
     stats = get_checkpoint_stats(checkpoint.id, db)
     
     return CheckpointResponse(
         id=checkpoint.id,
         site_id=checkpoint.site_id,
-        site_name=site.name if site else "Unknown",
+        site_name=site_name,
         name=checkpoint.name,
         description=checkpoint.description,
         checkpoint_type=checkpoint.checkpoint_type,
@@ -439,7 +411,7 @@ async def update_checkpoint(
 
 
 @router.delete("/{checkpoint_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_checkpoint(
+def delete_checkpoint(
     checkpoint_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -455,10 +427,7 @@ async def delete_checkpoint(
             detail="Only admins can delete checkpoints"
         )
     
-    checkpoint = db.query(Checkpoint).filter(
-        Checkpoint.id == checkpoint_id,
-        Checkpoint.deleted_at.is_(None)
-    ).first()
+    checkpoint = db.get(Checkpoint, checkpoint_id)
     
     if not checkpoint:
         raise HTTPException(
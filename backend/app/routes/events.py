@@ -1,10 +1,13 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from pydantic import BaseModel
-from datetime import datetime, date
-import math
+from datetime import datetime, date, time, timedelta
+import numpy as np
+import orjson
 
 from app.database import get_db
 from app.models.event import ClockEvent, Device
@@ -12,6 +15,10 @@ from app.models.site import Site
 from app.models.worker import Worker
 from app.models.user import User
 from app.routes.auth import get_current_user
+from app.routes.sites import get_org_site_ids
+from app.utils.cache import SiteGeofence, site_geofence_cache
+from app.utils.geo import calculate_distance, haversine_vec
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter()
 
@@ -42,25 +49,112 @@ class ClockEventResponse(BaseModel):
         from_attributes = True
 
 
-def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    R = 6371000
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    delta_phi = math.radians(lat2 - lat1)
-    delta_lambda = math.radians(lon2 - lon1)
-    a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-
-def validate_geofence(event: ClockEventCreate, site: Site) -> tuple[bool, float]:
+def validate_geofence(event: ClockEventCreate, site: SiteGeofence) -> tuple[bool, float]:
     distance = calculate_distance(event.gps_lat, event.gps_lon, site.gps_lat, site.gps_lon)
     is_valid = distance <= site.radius_m
     return is_valid, distance
 
 
+# Minimum time between last_sync writes for the same device
+DEVICE_SYNC_INTERVAL = timedelta(seconds=60)
+
+# A clock event is identified by who, where and when (unique index on clock_events)
+EVENT_KEY = ["worker_id", "site_id", "event_timestamp"]
+
+# Columns returned to clients, matching ClockEventResponse
+EVENT_RESPONSE_COLUMNS = (
+    ClockEvent.id,
+    ClockEvent.worker_id,
+    ClockEvent.site_id,
+    ClockEvent.event_type,
+    ClockEvent.event_timestamp,
+    ClockEvent.gps_lat,
+    ClockEvent.gps_lon,
+    ClockEvent.is_valid,
+    ClockEvent.distance_m,
+)
+
+
+def get_site_geofences(db: Session, organization_id: int, site_ids) -> dict:
+    """
+    Geofences of the given active sites in the organization, keyed by site id.
+    
+    Served from the process-local cache; only uncached sites are queried.
+    """
+    geofences = {}
+    missing = []
+    for site_id in set(site_ids):
+        geofence = site_geofence_cache.get(site_id)
+        if geofence is None:
+            missing.append(site_id)
+        else:
+            geofences[site_id] = geofence
+    
+    if missing:
+        rows = db.query(
+            Site.id, Site.organization_id, Site.gps_lat, Site.gps_lon, Site.radius_m
+        ).filter(
+            Site.id.in_(missing),
+            Site.deleted_at.is_(None)
+        ).all()
+        for row in rows:
+            geofence = SiteGeofence(*row)
+            site_geofence_cache.set(geofence.id, geofence)
+            geofences[geofence.id] = geofence
+    
+    return {
+        site_id: geofence
+        for site_id, geofence in geofences.items()
+        if geofence.organization_id == organization_id
+    }
+
+
+def touch_devices(db: Session, device_pks) -> None:
+    """Set last_sync on devices not already touched within DEVICE_SYNC_INTERVAL"""
+    # Rows that don't match the WHERE are neither written nor locked
+    db.query(Device).filter(
+        Device.id.in_(device_pks),
+        or_(
+            Device.last_sync.is_(None),
+            Device.last_sync < func.now() - DEVICE_SYNC_INTERVAL
+        )
+    ).update({Device.last_sync: func.now()}, synchronize_session=False)
+
+
+def get_or_create_devices(db: Session, organization_id: int, device_sites: dict) -> dict:
+    """
+    Map device_id strings to Device primary keys, creating missing devices.
+    
+    device_sites maps each device_id to the site it should be registered at.
+    Devices registered to another organization are left out of the result.
+    """
+    def lookup(device_ids):
+        return dict(db.query(Device.device_id, Device.id).filter(
+            Device.device_id.in_(device_ids),
+            Device.organization_id == organization_id
+        ).all())
+    
+    device_pks = lookup(list(device_sites))
+    missing = [device_id for device_id in device_sites if device_id not in device_pks]
+    
+    if missing:
+        # ON CONFLICT so concurrent uploads registering the same device don't fail
+        stmt = pg_insert(Device).values([
+            {"device_id": device_id, "organization_id": organization_id, "site_id": device_sites[device_id]}
+            for device_id in missing
+        ]).on_conflict_do_nothing(index_elements=["device_id"]).returning(Device.device_id, Device.id)
+        device_pks.update(dict(db.execute(stmt).all()))
+        
+        # Anything still missing was inserted by a concurrent request
+        raced = [device_id for device_id in missing if device_id not in device_pks]
+        if raced:
+            device_pks.update(lookup(raced))
+    
+    return device_pks
+
+
 @router.post("/", response_model=ClockEventResponse, status_code=201)
-async def create_event(
+def create_event(
     event: ClockEventCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -71,11 +165,7 @@ async def create_event(
     FIXED: Validates site and worker belong to user's organization
     """
     # Validate site exists and belongs to user's organization
-    site = db.query(Site).filter(
-        Site.id == event.site_id,
-        Site.organization_id == current_user.organization_id,
-        Site.deleted_at.is_(None)
-    ).first()
+    site = get_site_geofences(db, current_user.organization_id, [event.site_id]).get(event.site_id)
     
     if not site:
         raise HTTPException(status_code=404, detail="Site not found or access denied")
@@ -91,51 +181,49 @@ async def create_event(
         raise HTTPException(status_code=404, detail="Worker not found or access denied")
     
     # Get or create device
-    device = db.query(Device).filter(
-        Device.device_id == event.device_id,
-        Device.organization_id == current_user.organization_id
-    ).first()
+    device_pk = get_or_create_devices(
+        db, current_user.organization_id, {event.device_id: event.site_id}
+    ).get(event.device_id)
     
-    if not device:
-        device = Device(
-            device_id=event.device_id,
-            organization_id=current_user.organization_id,
-            site_id=event.site_id
-        )
-        db.add(device)
-        db.commit()
-        db.refresh(device)
+    if device_pk is None:
+        raise HTTPException(status_code=409, detail="Device is registered to another organization")
     
     # Validate geofence
     is_valid, distance = validate_geofence(event, site)
     
-    # Create event
-    db_event = ClockEvent(
-        worker_id=event.worker_id,
-        site_id=event.site_id,
-        device_id=device.id,
-        event_type=event.event_type,
-        event_timestamp=event.event_timestamp,
-        gps_lat=event.gps_lat,
-        gps_lon=event.gps_lon,
-        accuracy_m=event.accuracy_m,
-        is_valid=is_valid,
-        distance_m=distance
-    )
+    # Create event (a re-sent event returns the stored copy)
+    row = db.execute(
+        pg_insert(ClockEvent).values(
+            worker_id=event.worker_id,
+            site_id=event.site_id,
+            device_id=device_pk,
+            event_type=event.event_type,
+            event_timestamp=event.event_timestamp,
+            gps_lat=event.gps_lat,
+            gps_lon=event.gps_lon,
+            accuracy_m=event.accuracy_m,
+            is_valid=is_valid,
+            distance_m=distance
+        ).on_conflict_do_nothing(index_elements=EVENT_KEY).returning(*EVENT_RESPONSE_COLUMNS)
+    ).first()
     
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    if row is None:
+        row = db.query(*EVENT_RESPONSE_COLUMNS).filter(
+            ClockEvent.worker_id == event.worker_id,
+            ClockEvent.site_id == event.site_id,
+            ClockEvent.event_timestamp == event.event_timestamp
+        ).first()
     
     # Update device last sync
-    device.last_sync = datetime.utcnow()
+    touch_devices(db, [device_pk])
+    
     db.commit()
     
-    return db_event
+    return ClockEventResponse.model_validate(row)
 
 
 @router.post("/bulk", response_model=List[ClockEventResponse])
-async def create_events_bulk(
+def create_events_bulk(
     events: List[ClockEventCreate],
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -144,130 +232,222 @@ async def create_events_bulk(
     Bulk create clock events (for offline sync)
     
     FIXED: Validates all events belong to user's organization
+    
+    Sites, workers and devices are loaded with one query each instead of
+    per event, and events already stored are skipped by the database
+    (ON CONFLICT DO NOTHING on the worker/site/timestamp unique index).
     """
-    created_events = []
+    if not events:
+        return []
+    
+    org_id = current_user.organization_id
     
+    # Sites in user's organization referenced by the payload
+    sites = get_site_geofences(db, org_id, [event.site_id for event in events])
+    
+    # Workers in user's organization referenced by the payload
+    worker_ids = {
+        row[0]
+        for row in db.query(Worker.id).filter(
+            Worker.id.in_({event.worker_id for event in events}),
+            Worker.organization_id == org_id,
+            Worker.deleted_at.is_(None)
+        )
+    }
+    
+    seen = set()
+    accepted = []
     for event in events:
-        # Check for duplicates
-        existing = db.query(ClockEvent).filter(
-            and_(
-                ClockEvent.worker_id == event.worker_id,
-                ClockEvent.site_id == event.site_id,
-                ClockEvent.event_timestamp == event.event_timestamp
-            )
-        ).first()
-        
-        if existing:
-            continue
-        
-        # Validate site belongs to user's organization
-        site = db.query(Site).filter(
-            Site.id == event.site_id,
-            Site.organization_id == current_user.organization_id,
-            Site.deleted_at.is_(None)
-        ).first()
-        
-        if not site:
+        key = (event.worker_id, event.site_id, event.event_timestamp)
+        if key in seen:
+            continue  # Skip duplicates within the payload
+        if event.site_id not in sites:
             continue  # Skip events for inaccessible sites
-        
-        # Validate worker belongs to user's organization
-        worker = db.query(Worker).filter(
-            Worker.id == event.worker_id,
-            Worker.organization_id == current_user.organization_id,
-            Worker.deleted_at.is_(None)
-        ).first()
-        
-        if not worker:
+        if event.worker_id not in worker_ids:
             continue  # Skip events for inaccessible workers
-        
-        # Get or create device
-        device = db.query(Device).filter(
-            Device.device_id == event.device_id,
-            Device.organization_id == current_user.organization_id
-        ).first()
-        
-        if not device:
-            device = Device(
-                device_id=event.device_id,
-                organization_id=current_user.organization_id,
-                site_id=event.site_id
-            )
-            db.add(device)
-            db.commit()
-            db.refresh(device)
-        
-        # Validate geofence
-        is_valid, distance = validate_geofence(event, site)
-        
-        # Create event
-        db_event = ClockEvent(
-            worker_id=event.worker_id,
-            site_id=event.site_id,
-            device_id=device.id,
-            event_type=event.event_type,
-            event_timestamp=event.event_timestamp,
-            gps_lat=event.gps_lat,
-            gps_lon=event.gps_lon,
-            accuracy_m=event.accuracy_m,
-            is_valid=is_valid,
-            distance_m=distance
-        )
-        
-        db.add(db_event)
-        created_events.append(db_event)
+        seen.add(key)
+        accepted.append(event)
     
-    db.commit()
+    # Get or create devices (registered at the first site they appear with)
+    device_sites = {}
+    for event in accepted:
+        device_sites.setdefault(event.device_id, event.site_id)
+    device_pks = get_or_create_devices(db, org_id, device_sites) if accepted else {}
+    
+    # Skip events from devices registered to another organization
+    accepted = [event for event in accepted if event.device_id in device_pks]
     
-    for event in created_events:
-        db.refresh(event)
+    if not accepted:
+        return []
+    
+    # Validate geofences for the whole batch at once
+    event_sites = [sites[event.site_id] for event in accepted]
+    distances = haversine_vec(
+        [event.gps_lat for event in accepted],
+        [event.gps_lon for event in accepted],
+        [site.gps_lat for site in event_sites],
+        [site.gps_lon for site in event_sites]
+    )
+    valid = distances <= np.array([site.radius_m for site in event_sites], dtype=np.float64)
     
-    return created_events
+    rows = [
+        {
+            "worker_id": event.worker_id,
+            "site_id": event.site_id,
+            "device_id": device_pks[event.device_id],
+            "event_type": event.event_type,
+            "event_timestamp": event.event_timestamp,
+            "gps_lat": event.gps_lat,
+            "gps_lon": event.gps_lon,
+            "accuracy_m": event.accuracy_m,
+            "is_valid": is_valid,
+            "distance_m": distance,
+        }
+        for event, is_valid, distance in zip(accepted, valid.tolist(), distances.tolist())
+    ]
+    
+    # Single INSERT; rows already stored are dropped server-side
+    created = db.execute(
+        pg_insert(ClockEvent).values(rows)
+        .on_conflict_do_nothing(index_elements=EVENT_KEY)
+        .returning(*EVENT_RESPONSE_COLUMNS)
+    ).all()
+    db.commit()
+    
+    # RETURNING rows already have the response shape; skip per-row pydantic models
+    return ORJSONResponse([row._asdict() for row in created])
 
 
-@router.get("/", response_model=List[ClockEventResponse])
-async def list_events(
-    site_id: Optional[int] = None,
-    worker_id: Optional[int] = None,
-    date: Optional[date] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def filtered_events_query(
+    db: Session,
+    current_user: User,
+    site_id: Optional[int],
+    worker_id: Optional[int],
+    day: Optional[date]
 ):
     """
-    List clock events in current user's organization
+    Query for response columns of events in the user's organization, newest
+    first
     
-    FIXED: Now properly filters by organization_id
+    Organization scoping is part of the query itself, so a site or worker
+    from another organization simply matches nothing; callers use
+    check_event_filter_access to turn that into a 403.
     """
-    # Get all sites in user's organization
-    site_ids = db.query(Site.id).filter(
+    # Join to the organization's sites rather than sending every site id as an IN list
+    query = db.query(*EVENT_RESPONSE_COLUMNS).join(
+        Site, ClockEvent.site_id == Site.id
+    ).filter(
         Site.organization_id == current_user.organization_id,
         Site.deleted_at.is_(None)
-    ).all()
-    site_ids = [s[0] for s in site_ids]
-    
-    if not site_ids:
-        return []
-    
-    # Build query filtering by organization's sites
-    query = db.query(ClockEvent).filter(ClockEvent.site_id.in_(site_ids))
+    )
     
     # Apply additional filters
     if site_id:
-        # Verify site belongs to user's organization
-        if site_id not in site_ids:
-            raise HTTPException(status_code=403, detail="Access denied to this site")
         query = query.filter(ClockEvent.site_id == site_id)
     
     if worker_id:
-        # Verify worker belongs to user's organization
-        worker = db.query(Worker).filter(
+        query = query.join(Worker, ClockEvent.worker_id == Worker.id).filter(
+            Worker.id == worker_id,
+            Worker.organization_id == current_user.organization_id
+        )
+    
+    if day:
+        # Range on the raw column so the event_timestamp indexes can be used
+        day_start = datetime.combine(day, time.min)
+        query = query.filter(
+            ClockEvent.event_timestamp >= day_start,
+            ClockEvent.event_timestamp < day_start + timedelta(days=1)
+        )
+    
+    return query.order_by(ClockEvent.event_timestamp.desc(), ClockEvent.id.desc())
+
+
+def check_event_filter_access(
+    db: Session,
+    current_user: User,
+    site_id: Optional[int],
+    worker_id: Optional[int]
+):
+    """Raise 403 if a requested site or worker is outside the user's organization"""
+    if site_id and site_id not in get_org_site_ids(db, current_user.organization_id):
+        raise HTTPException(status_code=403, detail="Access denied to this site")
+    
+    if worker_id:
+        worker = db.query(Worker.id).filter(
             Worker.id == worker_id,
             Worker.organization_id == current_user.organization_id
         ).first()
         if not worker:
             raise HTTPException(status_code=403, detail="Access denied to this worker")
-        query = query.filter(ClockEvent.worker_id == worker_id)
+
+
+@router.get("/", response_model=List[ClockEventResponse])
+def list_events(
+    site_id: Optional[int] = None,
+    worker_id: Optional[int] = None,
+    date: Optional[date] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header from the previous page (preferred over offset)"),
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    List clock events in current user's organization
+    
+    FIXED: Now properly filters by organization_id
+    
+    Paginated with limit plus either `cursor` or `offset`; use /export for
+    the full result set. When more events follow, the response carries an
+    `X-Next-Cursor` header to pass as `cursor`. Cursor paging stays fast at
+    any depth, whereas a large offset makes Postgres skip that many rows.
+    """
+    query = filtered_events_query(db, current_user, site_id, worker_id, date)
+    
+    if cursor:
+        query = query.filter(
+            tuple_(ClockEvent.event_timestamp, ClockEvent.id) < tuple_(*decode_cursor(cursor))
+        )
+    else:
+        query = query.offset(offset)
+    
+    # One extra row tells whether another page follows, without a COUNT
+    rows = query.limit(limit + 1).all()
+    has_next = len(rows) > limit
+    rows = rows[:limit]
+    
+    # Only an empty first page can mean the site/worker belongs to another organization
+    if not rows and offset == 0 and not cursor:
+        check_event_filter_access(db, current_user, site_id, worker_id)
+    
+    headers = {}
+    if has_next:
+        headers["X-Next-Cursor"] = encode_cursor(rows[-1].event_timestamp, rows[-1].id)
+    
+    # Rows already have the response shape, so skip response_model validation
+    return ORJSONResponse([row._asdict() for row in rows], headers=headers)
+
+
+@router.get("/export")
+def export_events(
+    site_id: Optional[int] = None,
+    worker_id: Optional[int] = None,
+    date: Optional[date] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Stream all matching clock events as NDJSON (one event per line)
+    
+    Rows are fetched from a server-side cursor in batches, so memory use
+    doesn't grow with the size of the export.
+    """
+    # Checked up front: once streaming starts the status code can't change
+    check_event_filter_access(db, current_user, site_id, worker_id)
+    query = filtered_events_query(db, current_user, site_id, worker_id, date)
     
-    if date:
-        query = query.filter(func.date(ClockEvent.event_timestamp) == date)
+    def generate():
+        for row in query.yield_per(1000):
+            yield orjson.dumps(row._asdict()) + b"\n"
     
-    return query.order_by(ClockEvent.event_timestamp.desc()).all()
\ No newline at end of file
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session, joinedload, raiseload
+from sqlalchemy import and_, or_, tuple_
 from typing import List, Optional
 from datetime import datetime
 from app.database import get_db
@@ -8,20 +8,44 @@ from app.models.user import User
 from app.models.worker import Worker
 from app.models.task import IssueReport
 from app.models.site import Site
+from app.models.dashboard_stats import org_issue_counts, refresh_org_issue_counts
 from app.schemas.task import (
     IssueReportCreate, IssueReportUpdate, IssueReportResponse
 )
 from app.routes.worker_auth import get_current_user, get_current_worker
+from app.utils.pagination import encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/issues", tags=["Issue Reports"])
 
+# Columns of IssueReportResponse stored on the report itself
+ISSUE_RESPONSE_COLUMNS = (
+    IssueReport.id,
+    IssueReport.reporter_id,
+    IssueReport.site_id,
+    IssueReport.organization_id,
+    IssueReport.issue_type,
+    IssueReport.severity,
+    IssueReport.title,
+    IssueReport.description,
+    IssueReport.location,
+    IssueReport.gps_lat,
+    IssueReport.gps_lon,
+    IssueReport.status,
+    IssueReport.assigned_to,
+    IssueReport.resolution_notes,
+    IssueReport.resolved_at,
+    IssueReport.photos,
+    IssueReport.created_at,
+    IssueReport.updated_at,
+)
+
 
 # ==========================================
 # WORKER ENDPOINTS
 # ==========================================
 
 @router.post("", response_model=IssueReportResponse, status_code=status.HTTP_201_CREATED)
-async def create_issue_report(
+def create_issue_report(
     issue_data: IssueReportCreate,
     db: Session = Depends(get_db),
     current_worker: Worker = Depends(get_current_worker)
@@ -52,14 +76,15 @@ async def create_issue_report(
     db.add(new_issue)
     db.commit()
     db.refresh(new_issue)
+    refresh_org_issue_counts()
     
     # TODO: Send notification to managers
     
-    return enrich_issue_response(new_issue, db)
+    return enrich_issue_response(new_issue)
 
 
 @router.get("/my/reports", response_model=List[IssueReportResponse])
-async def get_my_issue_reports(
+def get_my_issue_reports(
     status: Optional[str] = None,
     limit: int = 50,
     db: Session = Depends(get_db),
@@ -68,7 +93,13 @@ async def get_my_issue_reports(
     """
     Get issue reports created by current worker.
     """
-    query = db.query(IssueReport).filter(
+    # Plain column rows with the site name joined in; no ORM objects to build
+    query = db.query(
+        *ISSUE_RESPONSE_COLUMNS,
+        Site.name.label("site_name")
+    ).outerjoin(
+        Site, Site.id == IssueReport.site_id
+    ).filter(
         IssueReport.reporter_id == current_worker.id
     )
     
@@ -77,13 +108,21 @@ async def get_my_issue_reports(
     
     query = query.order_by(IssueReport.created_at.desc())
     
-    issues = query.limit(limit).all()
+    rows = query.limit(limit).all()
     
-    return [enrich_issue_response(issue, db) for issue in issues]
+    # Every report here was filed by the current worker
+    return [
+        IssueReportResponse.model_construct(
+            **{**row._asdict(), "photos": row.photos or []},
+            reporter_name=current_worker.name
+        )
+        for row in rows
+    ]
 
 
-@router.get("/{issue_id}", response_model=IssueReportResponse)
-async def get_issue_report(
+# int convertor so /all and other literal paths below aren't matched here
+@router.get("/{issue_id:int}", response_model=IssueReportResponse)
+def get_issue_report(
     issue_id: int,
     db: Session = Depends(get_db),
     current_worker: Worker = Depends(get_current_worker)
@@ -91,18 +130,15 @@ async def get_issue_report(
     """
     Get specific issue report details.
     """
-    issue = db.query(IssueReport).filter(
-        IssueReport.id == issue_id,
-        IssueReport.reporter_id == current_worker.id
-    ).first()
+    issue = db.get(IssueReport, issue_id)
     
-    if not issue:
+    if not issue or issue.reporter_id != current_worker.id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Issue report not found"
         )
     
-    return enrich_issue_response(issue, db)
+    return enrich_issue_response(issue)
 
 
 # ==========================================
@@ -110,26 +146,38 @@ async def get_issue_report(
 # ==========================================
 
 @router.get("/all", response_model=List[IssueReportResponse])
-async def list_all_issues(
+def list_all_issues(
+    response: Response,
     site_id: Optional[int] = None,
     issue_type: Optional[str] = None,
     severity: Optional[str] = None,
     status: Optional[str] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor header from the previous page (preferred over skip)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Managers/Admins view all issue reports in their organization.
+    
+    Paginated with limit plus either `cursor` or `skip`. When more issues
+    follow, the response carries an `X-Next-Cursor` header to pass as
+    `cursor`; unlike skip, cursor paging costs the same at any depth.
     """
     if current_user.role not in ["admin", "manager"]:
         raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
+            status_code=403,  # `status` is shadowed by the query parameter here
             detail="Only admins and managers can view all issues"
         )
     
-    query = db.query(IssueReport).filter(
+    # Reporter and site names come with the page in the same query; any
+    # other relationship access raises instead of lazy-loading per row
+    query = db.query(IssueReport).options(
+        joinedload(IssueReport.reporter).load_only(Worker.name),
+        joinedload(IssueReport.site).load_only(Site.name),
+        raiseload("*")
+    ).filter(
         IssueReport.organization_id == current_user.organization_id
     )
     
@@ -153,18 +201,38 @@ async def list_all_issues(
         'minor': 3
     }
     
+    # Seek past the previous page's last (status, created_at, id)
+    if cursor:
+        cursor_status, cursor_created_at, cursor_id = decode_cursor(cursor, prefix_len=1)
+        query = query.filter(or_(
+            IssueReport.status > cursor_status,
+            and_(
+                IssueReport.status == cursor_status,
+                tuple_(IssueReport.created_at, IssueReport.id) < tuple_(cursor_created_at, cursor_id)
+            )
+        ))
+    
     query = query.order_by(
         IssueReport.status.asc(),  # Open issues first
-        IssueReport.created_at.desc()
+        IssueReport.created_at.desc(),
+        IssueReport.id.desc()  # Tie-breaker so the cursor is unambiguous
     )
     
-    issues = query.offset(skip).limit(limit).all()
+    if not cursor:
+        query = query.offset(skip)
     
-    return [enrich_issue_response(issue, db) for issue in issues]
+    # One extra row tells whether another page follows, without a COUNT
+    issues = query.limit(limit + 1).all()
+    if len(issues) > limit:
+        issues = issues[:limit]
+        last = issues[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(last.created_at, last.id, last.status)
+    
+    return [enrich_issue_response(issue) for issue in issues]
 
 
 @router.put("/{issue_id}", response_model=IssueReportResponse)
-async def update_issue_report(
+def update_issue_report(
     issue_id: int,
     issue_update: IssueReportUpdate,
     db: Session = Depends(get_db),
@@ -179,12 +247,9 @@ async def update_issue_report(
             detail="Only admins and managers can update issues"
         )
     
-    issue = db.query(IssueReport).filter(
-        IssueReport.id == issue_id,
-        IssueReport.organization_id == current_user.organization_id
-    ).first()
+    issue = db.get(IssueReport, issue_id)
     
-    if not issue:
+    if not issue or issue.organization_id != current_user.organization_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Issue report not found"
@@ -202,14 +267,15 @@ async def update_issue_report(
     issue.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(issue)
+    refresh_org_issue_counts()
     
     # TODO: Send notification to reporter
     
-    return enrich_issue_response(issue, db)
+    return enrich_issue_response(issue)
 
 
 @router.post("/{issue_id}/assign", response_model=IssueReportResponse)
-async def assign_issue(
+def assign_issue(
     issue_id: int,
     assigned_to_user_id: int,
     db: Session = Depends(get_db),
@@ -224,25 +290,20 @@ async def assign_issue(
             detail="Only admins and managers can assign issues"
         )
     
-    issue = db.query(IssueReport).filter(
-        IssueReport.id == issue_id,
-        IssueReport.organization_id == current_user.organization_id
-    ).first()
+    issue = db.get(IssueReport, issue_id)
     
-    if not issue:
+    if not issue or issue.organization_id != current_user.organization_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Issue report not found"
         )
     
     # Verify assigned user exists and is a manager
-    assigned_user = db.query(User).filter(
-        User.id == assigned_to_user_id,
-        User.organization_id == current_user.organization_id,
-        User.role.in_(["admin", "manager"])
-    ).first()
+    assigned_user = db.get(User, assigned_to_user_id)
     
-    if not assigned_user:
+    if (not assigned_user
+            or assigned_user.organization_id != current_user.organization_id
+            or assigned_user.role not in ["admin", "manager"]):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found or not a manager"
@@ -254,19 +315,23 @@ async def assign_issue(
     
     db.commit()
     db.refresh(issue)
+    refresh_org_issue_counts()
     
     # TODO: Send notification to assigned user
     
-    return enrich_issue_response(issue, db)
+    return enrich_issue_response(issue)
 
 
 @router.get("/stats/summary", response_model=dict)
-async def get_issue_stats(
+def get_issue_stats(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get issue statistics for dashboard.
+    
+    Read from the mv_org_issue_counts view, which issue writes refresh
+    within STATS_REFRESH_INTERVAL.
     """
     if current_user.role not in ["admin", "manager"]:
         raise HTTPException(
@@ -274,44 +339,39 @@ async def get_issue_stats(
             detail="Only admins and managers can view stats"
         )
     
-    # Count by status
-    open_count = db.query(IssueReport).filter(
-        IssueReport.organization_id == current_user.organization_id,
-        IssueReport.status == 'open'
-    ).count()
-    
-    investigating_count = db.query(IssueReport).filter(
-        IssueReport.organization_id == current_user.organization_id,
-        IssueReport.status == 'investigating'
-    ).count()
-    
-    resolved_count = db.query(IssueReport).filter(
-        IssueReport.organization_id == current_user.organization_id,
-        IssueReport.status == 'resolved'
-    ).count()
-    
-    # Count by severity (open only)
-    severe_count = db.query(IssueReport).filter(
-        IssueReport.organization_id == current_user.organization_id,
-        IssueReport.status.in_(['open', 'investigating']),
-        IssueReport.severity == 'severe'
-    ).count()
-    
-    # Count by type (open only)
-    type_counts = db.query(
-        IssueReport.issue_type,
-        func.count(IssueReport.id)
+    # Pre-aggregated (status, severity, type) counts; everything below is
+    # derived from these few rows
+    groups = db.query(
+        org_issue_counts.c.status,
+        org_issue_counts.c.severity,
+        org_issue_counts.c.issue_type,
+        org_issue_counts.c.count
     ).filter(
-        IssueReport.organization_id == current_user.organization_id,
-        IssueReport.status.in_(['open', 'investigating'])
-    ).group_by(IssueReport.issue_type).all()
+        org_issue_counts.c.organization_id == current_user.organization_id
+    ).all()
+    
+    # Also picks up writes made by other processes
+    refresh_org_issue_counts()
+    
+    status_counts = {"open": 0, "investigating": 0, "resolved": 0}
+    severe_count = 0
+    type_counts = {}
+    for issue_status, severity, issue_type, count in groups:
+        if issue_status in status_counts:
+            status_counts[issue_status] += count
+        
+        # Severity and type counts cover active (open/investigating) issues only
+        if issue_status in ("open", "investigating"):
+            if severity == "severe":
+                severe_count += count
+            type_counts[issue_type] = type_counts.get(issue_type, 0) + count
     
     return {
-        "open": open_count,
-        "investigating": investigating_count,
-        "resolved": resolved_count,
+        "open": status_counts["open"],
+        "investigating": status_counts["investigating"],
+        "resolved": status_counts["resolved"],
         "severe_active": severe_count,
-        "by_type": {type_name: count for type_name, count in type_counts}
+        "by_type": type_counts
     }
 
 
@@ -319,13 +379,15 @@ async def get_issue_stats(
 # HELPER FUNCTIONS
 # ==========================================
 
-def enrich_issue_response(issue: IssueReport, db: Session) -> IssueReportResponse:
-    """Add computed fields to issue response"""
-    reporter = db.query(Worker).filter(Worker.id == issue.reporter_id).first()
-    site = db.query(Site).filter(Site.id == issue.site_id).first()
+def enrich_issue_response(issue: IssueReport) -> IssueReportResponse:
+    """
+    Add computed fields to issue response
     
+    Reads issue.reporter / issue.site: eager-load them for lists. For single
+    issues they usually come from the session's identity map without SQL.
+    """
     issue_dict = IssueReportResponse.model_validate(issue).model_dump()
-    issue_dict['reporter_name'] = reporter.name if reporter else None
-    issue_dict['site_name'] = site.name if site else None
+    issue_dict['reporter_name'] = issue.reporter.name if issue.reporter else None
+    issue_dict['site_name'] = issue.site.name if issue.site else None
     
     return IssueReportResponse(**issue_dict)
\ No newline at end of file
@@ -1,23 +1,21 @@
 from typing import Optional
+from types import MappingProxyType
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, select
 from pydantic import BaseModel
-from passlib.context import CryptContext
 
 from app.database import get_db
 from app.models.user import Organization, User
 from app.models.site import Site
 from app.models.worker import Worker
+from app.models.dashboard_stats import org_usage_stats, refresh_org_usage_stats
 from app.routes.auth import get_current_user
+from app.utils.security import pwd_context
 
 router = APIRouter()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
 # ==========================================
 # PYDANTIC SCHEMAS
 # ==========================================
@@ -78,15 +76,19 @@ class UsageStats(BaseModel):
 # HELPER FUNCTIONS
 # ==========================================
 
-def get_plan_limits(plan: str) -> dict:
-    """Get the limits for each subscription plan"""
-    plans = {
-        "free": {"max_sites": 1, "max_workers": 10, "max_managers": 2},
-        "starter": {"max_sites": 3, "max_workers": 50, "max_managers": 5},
-        "pro": {"max_sites": 10, "max_workers": 200, "max_managers": 20},
-        "enterprise": {"max_sites": 999, "max_workers": 9999, "max_managers": 100}
-    }
-    return plans.get(plan, plans["free"])
+# Limits for each subscription plan (read-only; shared by every caller)
+PLAN_LIMITS = MappingProxyType({
+    "free": MappingProxyType({"max_sites": 1, "max_workers": 10, "max_managers": 2}),
+    "starter": MappingProxyType({"max_sites": 3, "max_workers": 50, "max_managers": 5}),
+    "pro": MappingProxyType({"max_sites": 10, "max_workers": 200, "max_managers": 20}),
+    "enterprise": MappingProxyType({"max_sites": 999, "max_workers": 9999, "max_managers": 100})
+})
+INVALID_PLAN = f"Invalid plan. Must be one of: {', '.join(PLAN_LIMITS)}"
+
+
+def get_plan_limits(plan: str):
+    """Get the limits for a subscription plan (free plan limits for unknown plans)"""
+    return PLAN_LIMITS.get(plan, PLAN_LIMITS["free"])
 
 
 # ==========================================
@@ -94,7 +96,7 @@ def get_plan_limits(plan: str) -> dict:
 # ==========================================
 
 @router.post("/register")
-async def register_organization(
+def register_organization(
     org_data: OrganizationRegister,
     db: Session = Depends(get_db)
 ):
@@ -104,7 +106,7 @@ async def register_organization(
     This is a public endpoint - no authentication required
     """
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == org_data.admin_email).first()
+    existing_user = db.query(User).filter(func.lower(User.email) == org_data.admin_email.lower()).one_or_none()
     if existing_user:
         raise HTTPException(
             status_code=400,
@@ -112,7 +114,7 @@ async def register_organization(
         )
     
     # Check if organization name already exists
-    existing_org = db.query(Organization).filter(Organization.name == org_data.name).first()
+    existing_org = db.query(Organization).filter(Organization.name == org_data.name).one_or_none()
     if existing_org:
         raise HTTPException(
             status_code=400,
@@ -163,7 +165,7 @@ async def register_organization(
 
 
 @router.get("/{org_id}", response_model=OrganizationResponse)
-async def get_organization(
+def get_organization(
     org_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -188,7 +190,7 @@ async def get_organization(
 
 
 @router.put("/{org_id}", response_model=OrganizationResponse)
-async def update_organization(
+def update_organization(
     org_id: int,
     org_update: OrganizationUpdate,
     current_user: User = Depends(get_current_user),
@@ -227,7 +229,7 @@ async def update_organization(
 
 
 @router.put("/{org_id}/plan", response_model=OrganizationResponse)
-async def update_subscription_plan(
+def update_subscription_plan(
     org_id: int,
     plan_update: PlanUpdate,
     current_user: User = Depends(get_current_user),
@@ -246,11 +248,10 @@ async def update_subscription_plan(
         raise HTTPException(status_code=403, detail="Only admins can change plans")
     
     # Validate plan
-    valid_plans = ["free", "starter", "pro", "enterprise"]
-    if plan_update.plan not in valid_plans:
+    if plan_update.plan not in PLAN_LIMITS:
         raise HTTPException(
             status_code=400,
-            detail=f"Invalid plan. Must be one of: {', '.join(valid_plans)}"
+            detail=INVALID_PLAN
         )
     
     # Get organization
@@ -286,7 +287,7 @@ async def update_subscription_plan(
 
 
 @router.get("/{org_id}/stats", response_model=UsageStats)
-async def get_organization_stats(
+def get_organization_stats(
     org_id: int,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -294,36 +295,49 @@ async def get_organization_stats(
     """
     Get organization usage statistics
     
-    Shows current usage vs plan limits
+    Shows current usage vs plan limits. Usage is read from the
+    mv_org_usage_stats view, which site/worker/user writes
+    refresh within STATS_REFRESH_INTERVAL.
     """
     # Check permissions
     if current_user.organization_id != org_id:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get organization
-    org = db.query(Organization).filter(Organization.id == org_id).first()
-    if not org:
-        raise HTTPException(status_code=404, detail="Organization not found")
-    
-    # Count current usage
-    current_sites = db.query(func.count(Site.id)).filter(
+    # Current usage comes from the mv_org_usage_stats view; an organization
+    # created since its last refresh has no row yet and is counted live
+    live_sites = select(func.count(Site.id)).where(
         Site.organization_id == org_id,
         Site.deleted_at.is_(None)
-    ).scalar() or 0
+    ).scalar_subquery()
     
-    current_workers = db.query(func.count(Worker.id)).filter(
+    live_workers = select(func.count(Worker.id)).where(
         Worker.organization_id == org_id,
         Worker.deleted_at.is_(None),
         Worker.is_active == True
-    ).scalar() or 0
+    ).scalar_subquery()
     
     # Count managers (users with manager role or mode)
-    current_managers = db.query(func.count(User.id)).filter(
+    live_managers = select(func.count(User.id)).where(
         User.organization_id == org_id,
-        User.is_active == True
-    ).filter(
+        User.is_active == True,
         (User.user_mode == "manager") | (User.role == "manager")
-    ).scalar() or 0
+    ).scalar_subquery()
+    
+    # Postgres only evaluates a COALESCE fallback when the view value is NULL
+    row = db.query(
+        Organization,
+        func.coalesce(org_usage_stats.c.current_sites, live_sites),
+        func.coalesce(org_usage_stats.c.current_workers, live_workers),
+        func.coalesce(org_usage_stats.c.current_managers, live_managers)
+    ).outerjoin(
+        org_usage_stats, org_usage_stats.c.organization_id == Organization.id
+    ).filter(Organization.id == org_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    org, current_sites, current_workers, current_managers = row
+    
+    # Also picks up writes made by other processes
+    refresh_org_usage_stats()
     
     # Calculate days until expiry
     days_until_expiry = None
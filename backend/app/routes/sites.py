@@ -7,7 +7,10 @@ from datetime import datetime, time
 from app.database import get_db
 from app.models.site import Site
 from app.models.user import User
+from app.models.user_site import UserSite
+from app.models.dashboard_stats import refresh_org_usage_stats
 from app.routes.auth import get_current_user
+from app.utils.cache import site_geofence_cache, org_site_ids_cache
 
 router = APIRouter()
 
@@ -36,6 +39,60 @@ class SiteResponse(BaseModel):
         from_attributes = True
 
 
+def get_org_site_ids(db: Session, organization_id: int) -> frozenset:
+    """Ids of the organization's active sites (cached briefly per process)"""
+    site_ids = org_site_ids_cache.get(organization_id)
+    if site_ids is None:
+        site_ids = frozenset(
+            row[0] for row in db.query(Site.id).filter(
+                Site.organization_id == organization_id,
+                Site.deleted_at.is_(None)
+            )
+        )
+        org_site_ids_cache.set(organization_id, site_ids)
+    return site_ids
+
+
+def can_access_site(user: User, site_id: int, db: Session) -> bool:
+    """
+    Check if user can access this site
+    
+    Answers are remembered in the request's session (db.info), so repeated
+    checks for the same user and site within one request don't re-query.
+    """
+    site_access = db.info.setdefault("site_access", {})
+    key = (user.id, site_id)
+    if key not in site_access:
+        site_access[key] = check_site_access(user, site_id, db)
+    return site_access[key]
+
+
+def check_site_access(user: User, site_id: int, db: Session) -> bool:
+    """Uncached access check behind can_access_site"""
+    # Super admin (org_id=1) can access everything
+    if user.organization_id == 1:
+        return True
+    
+    # Check if site belongs to user's organization
+    site = db.get(Site, site_id)
+    if not site or site.organization_id != user.organization_id:
+        return False
+    
+    # Admins can access all sites in their org
+    if user.role == "admin":
+        return True
+    
+    # Managers need to be assigned to the site
+    if user.role == "manager":
+        assigned = db.query(UserSite.id).filter(
+            UserSite.user_id == user.id,
+            UserSite.site_id == site_id
+        ).first()
+        return assigned is not None
+    
+    return False
+
+
 @router.post("/", response_model=SiteResponse, status_code=201)
 async def create_site(
     site: SiteCreate,
@@ -51,6 +108,8 @@ async def create_site(
     )
     db.add(db_site)
     db.commit()
+    org_site_ids_cache.pop(current_user.organization_id)
+    refresh_org_usage_stats()
     db.refresh(db_site)
     return db_site
 
@@ -118,6 +177,7 @@ async def update_site(
     db_site.updated_at = datetime.utcnow()
     
     db.commit()
+    site_geofence_cache.pop(site_id)
     db.refresh(db_site)
     return db_site
 
@@ -143,4 +203,7 @@ async def delete_site(
     db_site.updated_by = current_user.id
     
     db.commit()
+    site_geofence_cache.pop(site_id)
+    org_site_ids_cache.pop(current_user.organization_id)
+    refresh_org_usage_stats()
     return None
\ No newline at end of file
@@ -13,6 +13,7 @@ from app.schemas.task import (
     WorkerDashboardResponse
 )
 from app.routes.worker_auth import get_current_user, get_current_worker
+from app.utils.cache import invalidate_attendance_summaries
 
 router = APIRouter(prefix="/tasks", tags=["Tasks"])
 
@@ -343,6 +344,7 @@ async def complete_task(
     task.updated_at = datetime.utcnow()
     
     db.commit()
+    invalidate_attendance_summaries(current_worker.id)
     db.refresh(task)
     
     # TODO: Send notification to manager
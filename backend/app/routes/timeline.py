@@ -15,6 +15,7 @@ from app.models.worker import Worker
 from app.models.site import Site
 from app.models.user import User
 from app.routes.auth import get_current_user
+from app.routes.sites import can_access_site
 
 
 router = APIRouter()
@@ -98,29 +99,6 @@ def can_access_worker(user: User, worker_id: int, db: Session) -> bool:
     return False
 
 
-def can_access_site(user: User, site_id: int, db: Session) -> bool:
-    """Check if user can access this site"""
-    if user.organization_id == 1:
-        return True
-    
-    site = db.query(Site).filter(Site.id == site_id).first()
-    if not site or site.organization_id != user.organization_id:
-        return False
-    
-    if user.role == "admin":
-        return True
-    
-    if user.role == "manager":
-        from app.models.user import user_sites
-        assigned = db.query(user_sites).filter(
-            user_sites.c.user_id == user.id,
-            user_sites.c.site_id == site_id
-        ).first()
-        return assigned is not None
-    
-    return False
-
-
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
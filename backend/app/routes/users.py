@@ -2,12 +2,14 @@ from typing import List, Optional
 from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from sqlalchemy import text, and_
+from sqlalchemy import text, and_, func
 from pydantic import BaseModel, EmailStr
 
 from app.database import get_db
 from app.models.user import User
+from app.models.dashboard_stats import refresh_org_usage_stats
 from app.routes.auth import get_current_user, get_password_hash
+from app.utils.cache import invalidate_current_user
 
 router = APIRouter()
 
@@ -89,7 +91,7 @@ def assign_user_to_sites(user_id: int, site_ids: List[int], db: Session):
 # ==========================================
 
 @router.post("/", response_model=UserResponse, status_code=201)
-async def create_user(
+def create_user(
     user_data: UserCreate,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -107,7 +109,7 @@ async def create_user(
         )
     
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = db.query(User).filter(func.lower(User.email) == user_data.email.lower()).one_or_none()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
@@ -141,6 +143,7 @@ async def create_user(
     
     db.add(new_user)
     db.commit()
+    refresh_org_usage_stats()
     db.refresh(new_user)
     
     # Assign to sites if provided
@@ -283,6 +286,7 @@ async def update_user(
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Update fields
+    previous_email = user.email
     update_data = user_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(user, key, value)
@@ -291,6 +295,8 @@ async def update_user(
     user.updated_at = datetime.now(timezone.utc)
     
     db.commit()
+    invalidate_current_user(user.id, previous_email)
+    refresh_org_usage_stats()
     db.refresh(user)
     
     assigned_sites = get_user_assigned_sites(user.id, db)
@@ -395,6 +401,8 @@ async def delete_user(
     user.updated_at = datetime.now(timezone.utc)
     
     db.commit()
+    invalidate_current_user(user.id, user.email)
+    refresh_org_usage_stats()
     
     return {
         "message": "User deleted successfully",
@@ -9,6 +9,7 @@ from decimal import Decimal
 from app.database import get_db
 from app.models.user import User
 from app.models.worker import Worker
+from app.models.dashboard_stats import refresh_org_usage_stats
 from app.routes.auth import get_current_user
 
 router = APIRouter()
@@ -303,6 +304,7 @@ async def bulk_create_workers(
                 status_code=500,
                 detail=f"Failed to commit workers: {str(e)}"
             )
+        refresh_org_usage_stats()
     
     return {
         "message": f"Created {len(created_workers)} workers, skipped {len(errors)} duplicates/errors",
@@ -368,6 +370,7 @@ async def bulk_update_workers(
             })
     
     db.commit()
+    refresh_org_usage_stats()
     
     return {
         "message": f"Updated {len(updated_workers)} workers",
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, undefer
+from sqlalchemy import func
 from app.database import get_db
 from app.models.user import User
 from app.models.worker import Worker
+from app.models.dashboard_stats import refresh_org_usage_stats
 from app.schemas.task import WorkerLoginRequest, WorkerRegisterRequest, WorkerAuthResponse
 from app.utils.security import verify_password, get_password_hash, create_access_token, decode_access_token
+from app.utils.cache import current_user_cache
 from datetime import datetime, timedelta
 
 router = APIRouter(prefix="/auth/worker", tags=["Worker Authentication"])
@@ -17,7 +20,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/login")
 # ==========================================
 # DEPENDENCY: Get Current User (Admin/Manager)
 # ==========================================
-async def get_current_user(
+def get_current_user(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> User:
@@ -51,6 +54,7 @@ async def get_current_user(
     print(f"🔍 DEBUG: user_id from token: {user_id}")
     
     # If not present, use 'sub' (email) to lookup user (existing format)
+    email = None
     if not user_id:
         email = payload.get("sub")
         print(f"🔍 DEBUG: No user_id, using email from 'sub': {email}")
@@ -58,25 +62,30 @@ async def get_current_user(
         if not email:
             print("❌ DEBUG: No email in payload")
             raise credentials_exception
-        
+    
+    # Email keys are shared with auth.get_current_user's cache entries
+    cache_key = ("user_id", user_id) if user_id else email
+    user = current_user_cache.get(cache_key)
+    if user is None:
         try:
-            user = db.query(User).filter(User.email == email).first()
-            print(f"🔍 DEBUG: Database query for email '{email}' returned: {user.email if user else 'None'}")
+            if user_id:
+                user = db.query(User).filter(User.id == user_id).first()
+            else:
+                user = db.query(User).filter(func.lower(User.email) == email.lower()).one_or_none()
+            print(f"🔍 DEBUG: Database lookup for {cache_key!r} returned: {user.email if user else 'None'}")
         except Exception as e:
             print(f"❌ DEBUG: Database error: {str(e)}")
             raise credentials_exception
-    else:
-        print(f"🔍 DEBUG: Looking up user by user_id: {user_id}")
-        try:
-            user = db.query(User).filter(User.id == user_id).first()
-            print(f"🔍 DEBUG: Database query for user_id {user_id} returned: {user.email if user else 'None'}")
-        except Exception as e:
-            print(f"❌ DEBUG: Database error: {str(e)}")
+        
+        if not user:
+            print("❌ DEBUG: User not found in database")
             raise credentials_exception
+        
+        # Cache a detached copy; each request gets its own session-bound one
+        db.expunge(user)
+        current_user_cache.set(cache_key, user)
     
-    if not user:
-        print("❌ DEBUG: User not found in database")
-        raise credentials_exception
+    user = db.merge(user, load=False)
     
     print(f"✅ DEBUG: Successfully authenticated user: {user.email}, role: {user.role}")
     print("=" * 60)
@@ -87,7 +96,7 @@ async def get_current_user(
 # WORKER LOGIN
 # ==========================================
 @router.post("/login", response_model=WorkerAuthResponse)
-async def worker_login(
+def worker_login(
     credentials: WorkerLoginRequest,
     db: Session = Depends(get_db)
 ):
@@ -123,7 +132,9 @@ async def worker_login(
         )
     
     # Get linked user account
-    user = db.query(User).filter(User.id == worker.user_id).first()
+    user = db.query(User).options(undefer(User.hashed_password)).filter(
+        User.id == worker.user_id
+    ).first()
     
     if not user:
         print(f"❌ DEBUG: User {worker.user_id} not found in database")
@@ -204,7 +215,7 @@ async def worker_login(
 # CREATE WORKER ACCOUNT
 # ==========================================
 @router.post("/register", response_model=dict)
-async def create_worker_with_account(
+def create_worker_with_account(
     worker_data: WorkerRegisterRequest,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
@@ -244,7 +255,7 @@ async def create_worker_with_account(
     
     # Check if email already exists (if provided)
     if worker_data.email:
-        existing_user = db.query(User).filter(User.email == worker_data.email).first()
+        existing_user = db.query(User).filter(func.lower(User.email) == worker_data.email.lower()).one_or_none()
         if existing_user:
             print(f"❌ DEBUG: Email {worker_data.email} already exists")
             raise HTTPException(
@@ -317,6 +328,7 @@ async def create_worker_with_account(
         db.add(new_worker)
         db.commit()
         db.refresh(new_worker)
+        refresh_org_usage_stats()
         print(f"✅ DEBUG: Worker created with id: {new_worker.id}")
     except Exception as e:
         print(f"❌ DEBUG: Error creating worker: {str(e)}")
@@ -346,7 +358,7 @@ async def create_worker_with_account(
 # PASSWORD RESET
 # ==========================================
 @router.post("/password-reset-request")
-async def request_password_reset(
+def request_password_reset(
     employee_id: str,
     email: str,
     db: Session = Depends(get_db)
@@ -368,7 +380,7 @@ async def request_password_reset(
     # Get user account
     user = db.query(User).filter(
         User.id == worker.user_id,
-        User.email == email
+        func.lower(User.email) == email.lower()
     ).first()
     
     if not user:
@@ -383,7 +395,7 @@ async def request_password_reset(
 # ==========================================
 # DEPENDENCY: Get Current Worker
 # ==========================================
-async def get_current_worker(
+def get_current_worker(
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ) -> Worker:
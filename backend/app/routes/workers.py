@@ -7,6 +7,7 @@ from datetime import datetime
 from app.database import get_db
 from app.models.worker import Worker
 from app.models.user import User
+from app.models.dashboard_stats import refresh_org_usage_stats
 from app.routes.auth import get_current_user
 
 router = APIRouter()
@@ -48,6 +49,7 @@ async def create_worker(
     )
     db.add(db_worker)
     db.commit()
+    refresh_org_usage_stats()
     db.refresh(db_worker)
     return db_worker
 
@@ -120,6 +122,7 @@ async def update_worker(
     db_worker.updated_at = datetime.utcnow()
     
     db.commit()
+    refresh_org_usage_stats()
     db.refresh(db_worker)
     return db_worker
 
@@ -146,4 +149,5 @@ async def delete_worker(
     db_worker.updated_by = current_user.id
     
     db.commit()
+    refresh_org_usage_stats()
     return None
\ No newline at end of file
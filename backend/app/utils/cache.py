@@ -0,0 +1,108 @@
+"""
+Process-local caches for data that rarely changes.
+
+Entries expire after a TTL so other worker processes pick up changes
+within that window; the process that makes a change invalidates its own
+copy immediately.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from collections import OrderedDict, namedtuple
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire `ttl` seconds after being set.
+
+    Route handlers run in a threadpool, so every access takes a lock.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# ==========================================
+# SITE GEOFENCES
+# ==========================================
+# Fields needed to validate a clock event against a site
+SiteGeofence = namedtuple("SiteGeofence", ["id", "organization_id", "gps_lat", "gps_lon", "radius_m"])
+
+# site_id -> SiteGeofence for active (not deleted) sites
+site_geofence_cache = TTLCache(maxsize=4096, ttl=300)
+
+# organization_id -> frozenset of active (not deleted) site ids
+org_site_ids_cache = TTLCache(maxsize=1024, ttl=30)
+
+
+# ==========================================
+# ATTENDANCE SUMMARIES
+# ==========================================
+# (worker_id, period, date) -> AttendanceSummaryResponse
+attendance_summary_cache = TTLCache(maxsize=4096, ttl=300)
+
+
+def invalidate_attendance_summaries(worker_id: int):
+    """Drop a worker's cached summaries after their attendance changes"""
+    # Same UTC day as the cache keys set by get_attendance_summary
+    today = datetime.now(timezone.utc).date()
+    for period in ("week", "month"):
+        attendance_summary_cache.pop((worker_id, period, today))
+
+
+# ==========================================
+# AUTHENTICATED USERS
+# ==========================================
+# token subject (email) or ("user_id", id) for tokens that carry one ->
+# detached User, so get_current_user can skip the users query. Short TTL
+# bounds how long a role change or deactivation made by another process
+# takes to apply.
+current_user_cache = TTLCache(maxsize=10000, ttl=60)
+
+
+def invalidate_current_user(user_id: int, email: str):
+    """Drop a user's cached entries after their account changes"""
+    current_user_cache.pop(email)
+    current_user_cache.pop(("user_id", user_id))
+
+
+# ==========================================
+# AUDIT DASHBOARD
+# ==========================================
+# Keyed by the caller's organization, never the user, so admins of the
+# same organization share entries and nothing crosses organizations.
+# ("recent", organization_id, limit) -> list of AuditLogResponse
+# ("stats", organization_id, days) -> stats dict
+audit_recent_cache = TTLCache(maxsize=1024, ttl=15)
+audit_stats_cache = TTLCache(maxsize=1024, ttl=60)
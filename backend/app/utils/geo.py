@@ -0,0 +1,73 @@
+"""
+Great-circle distance helpers for geofence checks.
+
+calculate_distance is for single points; haversine_vec handles whole
+batches at once with NumPy. inside_geofence answers only "within
+radius?": it rejects points outside the geofence's bounding box without
+any trig and never converts back to meters.
+"""
+import math
+from functools import lru_cache
+import numpy as np
+
+EARTH_RADIUS_M = 6371000
+
+# Meters per degree of latitude (and of longitude at the equator)
+METERS_PER_DEGREE = 111320
+
+
+def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Haversine distance in meters between two GPS points"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi/2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda/2)**2
+    # asin form: one sqrt instead of two plus atan2; clamp guards float drift past 1
+    c = 2 * math.asin(math.sqrt(min(1.0, a)))
+    return EARTH_RADIUS_M * c
+
+
+@lru_cache(maxsize=1024)
+def geofence_threshold(radius_m: float) -> float:
+    """Haversine term `a` at exactly `radius_m`: sin^2(radius / 2R)"""
+    return math.sin(radius_m / (2 * EARTH_RADIUS_M)) ** 2
+
+
+def outside_bounding_box(lat: float, lon: float, site_lat: float, site_lon: float, radius_m: float) -> bool:
+    """
+    Whether a point is clearly beyond `radius_m` of a site, using only
+    degree differences (padded 1% so points near the edge still get the
+    exact check)
+    """
+    lat_deg = 1.01 * radius_m / METERS_PER_DEGREE
+    lon_deg = lat_deg / max(0.01, math.cos(math.radians(site_lat)))
+    lon_diff = abs(lon - site_lon) % 360
+    return abs(lat - site_lat) > lat_deg or min(lon_diff, 360 - lon_diff) > lon_deg
+
+
+def inside_geofence(lat: float, lon: float, site_lat: float, site_lon: float, radius_m: float) -> bool:
+    """
+    Whether a point lies within `radius_m` of a site
+    
+    distance = 2R * asin(sqrt(a)) grows with `a`, so comparing `a` against
+    the radius's own `a` gives the same answer without sqrt/asin.
+    """
+    if outside_bounding_box(lat, lon, site_lat, site_lon, radius_m):
+        return False
+    phi1 = math.radians(lat)
+    phi2 = math.radians(site_lat)
+    a = (math.sin((phi2 - phi1)/2)**2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(site_lon - lon)/2)**2)
+    return a <= geofence_threshold(radius_m)
+
+
+def haversine_vec(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Haversine distance in meters for arrays of coordinate pairs"""
+    phi1 = np.radians(np.asarray(lat1, dtype=np.float64))
+    phi2 = np.radians(np.asarray(lat2, dtype=np.float64))
+    delta_phi = phi2 - phi1
+    delta_lambda = np.radians(np.asarray(lon2, dtype=np.float64) - np.asarray(lon1, dtype=np.float64))
+    a = np.sin(delta_phi/2)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda/2)**2
+    c = 2 * np.arcsin(np.sqrt(np.minimum(1.0, a)))
+    return EARTH_RADIUS_M * c
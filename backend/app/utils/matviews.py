@@ -0,0 +1,100 @@
+"""
+Throttled refreshes of materialized views.
+
+Refreshes run CONCURRENTLY (readers are never blocked) and at most once
+per interval per process. A request that arrives too soon, or while a
+refresh is running, is not dropped: it schedules one trailing refresh
+for when the interval ends, so every change reaches the view within
+roughly one interval.
+"""
+import threading
+import time
+from datetime import timedelta
+from sqlalchemy import text
+
+from app.database import get_engine
+
+
+class _RefreshState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_refresh = None  # time.monotonic() of the last finished refresh
+        self.running = False
+        self.pending = None  # threading.Timer for the trailing refresh
+        self.dirty = False  # requested while a refresh was running
+
+
+_states = {}
+_states_lock = threading.Lock()
+
+
+def _get_state(name: str) -> _RefreshState:
+    with _states_lock:
+        return _states.setdefault(name, _RefreshState())
+
+
+def refresh_materialized_view(name: str, min_interval: timedelta):
+    """
+    Refresh view `name` now, or once `min_interval` after the last refresh
+    if that hasn't passed yet (background task)
+    """
+    _request_refresh(name, min_interval, run_inline=True)
+
+
+def schedule_refresh(name: str, min_interval: timedelta):
+    """
+    Like refresh_materialized_view, but never runs the refresh on the
+    calling thread, so request handlers can call it directly after a write
+    """
+    _request_refresh(name, min_interval, run_inline=False)
+
+
+def _request_refresh(name: str, min_interval: timedelta, run_inline: bool):
+    state = _get_state(name)
+    with state.lock:
+        if state.running:
+            state.dirty = True  # Picked up when the running refresh finishes
+            return
+        if state.pending is not None:
+            return  # A trailing refresh is already scheduled
+        
+        wait = 0.0
+        if state.last_refresh is not None:
+            wait = state.last_refresh + min_interval.total_seconds() - time.monotonic()
+        if wait > 0 or not run_inline:
+            state.pending = threading.Timer(max(wait, 0.0), _run_pending, (name, min_interval))
+            state.pending.daemon = True
+            state.pending.start()
+            return
+        state.running = True
+    
+    _run_refresh(name, min_interval, state)
+
+
+def _run_pending(name: str, min_interval: timedelta):
+    """Timer callback for a trailing refresh"""
+    state = _get_state(name)
+    with state.lock:
+        state.pending = None
+        if state.running:
+            state.dirty = True
+            return
+        state.running = True
+    _run_refresh(name, min_interval, state)
+
+
+def _run_refresh(name: str, min_interval: timedelta, state: _RefreshState):
+    try:
+        with get_engine().begin() as conn:
+            conn.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {name}"))
+    except Exception as e:
+        print(f"⚠️ Refresh of {name} failed: {str(e)}")
+    finally:
+        with state.lock:
+            state.running = False
+            state.last_refresh = time.monotonic()
+            dirty, state.dirty = state.dirty, False
+    
+    # Changes made during the refresh may have missed it
+    if dirty:
+        schedule_refresh(name, min_interval)
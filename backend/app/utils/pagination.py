@@ -0,0 +1,36 @@
+"""
+Keyset pagination cursors.
+
+A cursor encodes the (timestamp, id) of the last row of a page; the next
+page is the rows that sort after it, which an index on (timestamp, id)
+serves directly no matter how deep the client has paged.
+"""
+import base64
+from datetime import datetime
+from fastapi import HTTPException, status
+
+
+def encode_cursor(timestamp: datetime, row_id: int, *prefix: str) -> str:
+    """
+    Opaque cursor pointing just past the given row
+    
+    `prefix` holds leading sort keys for listings ordered by more than
+    (timestamp, id), e.g. a status column.
+    """
+    raw = "|".join([*prefix, timestamp.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, prefix_len: int = 0):
+    """Inverse of encode_cursor: (*prefix, timestamp, id); raises 400 on garbage"""
+    try:
+        parts = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        if len(parts) != prefix_len + 2:
+            raise ValueError("wrong number of cursor parts")
+        *prefix, timestamp, row_id = parts
+        return (*prefix, datetime.fromisoformat(timestamp), int(row_id))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
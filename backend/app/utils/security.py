@@ -1,5 +1,6 @@
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+import jwt
+from jwt import InvalidTokenError as JWTError
 from datetime import datetime, timedelta
 from typing import Optional
 import os
@@ -8,13 +9,23 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: new hashes use argon2id; bcrypt hashes still verify
+# and are flagged by needs_update() so login can rehash them
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    default="argon2",
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
+)
 
 # JWT settings - Read from environment variables
 SECRET_KEY = os.getenv("SECRET_KEY", "some-random-secret-key-here")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "10080"))
+SECRET_KEY_BYTES = SECRET_KEY.encode()  # Encoded once, not per token
 
 print(f"🔑 Security initialized with SECRET_KEY: {SECRET_KEY[:10]}...")
 print(f"🔑 Algorithm: {ALGORITHM}")
@@ -60,7 +71,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     to_encode.update({"exp": expire})
     
     try:
-        encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        encoded_jwt = jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
         return encoded_jwt
     except Exception as e:
         print(f"❌ Error creating JWT token: {str(e)}")
@@ -78,17 +89,8 @@ def decode_access_token(token: str) -> Optional[dict]:
         Dictionary containing the token payload if valid, None otherwise
     """
     try:
-        # Decode the JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        
-        # Check if token has expired
-        exp = payload.get("exp")
-        if exp:
-            if datetime.utcnow().timestamp() > exp:
-                print("⚠️ Token has expired")
-                return None
-        
-        return payload
+        # Decode the JWT token (PyJWT also rejects expired tokens)
+        return jwt.decode(token, SECRET_KEY_BYTES, algorithms=[ALGORITHM])
     
     except JWTError as e:
         print(f"⚠️ JWT Error: {str(e)}")